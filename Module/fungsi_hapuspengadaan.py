@@ -1,10 +1,16 @@
 import pandas as pd
-import time
 import os
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+import json
+import re
 from dotenv import load_dotenv
 from tkinter import filedialog
+from Module import fungsi_sheetsclient
+from Module import fungsi_scheduler as scheduler
+from Module import fungsi_indekskatalog
+from Module import fungsi_metadata
+from Module import fungsi_trace
+from Module import fungsi_journal
+from globals import get_stop_requested
 
 # Fungsi bantu untuk aman konversi string
 def safe_str(val):
@@ -12,140 +18,1029 @@ def safe_str(val):
         return str(val).strip().replace("-", "").replace(" ", "")
     return ""
 
+# Kolom kunci pencocokan: nama kunci -> header di baris 9 sheet (huruf kecil)
+KEY_COLUMNS = {
+    "uuid": "uuid",
+    "isbn": "isbn cetak",
+    "isbn_e": "isbn elektronik*",
+}
+# Nama kolom kunci di file Excel penghapusan
+KEY_LABELS = {
+    "uuid": "UUID",
+    "isbn": "ISBN Cetak",
+    "isbn_e": "ISBN Elektronik*",
+}
+# UUID dicocokkan apa adanya, ISBN tidak peka huruf besar/kecil
+CASE_SENSITIVE_KEYS = {"uuid"}
+FIRST_DATA_ROW = 10
+
+# Mode penghapusan
+MODE_SEMUA = "semua"  # hapus semua baris sheet yang cocok
+MODE_PERTAMA = "pertama"  # hanya baris cocok pertama per baris Excel (perilaku lama)
+
+# Normalisasi satu nilai kunci sesuai jenisnya
+def normalize_key(key_name, val):
+    key = safe_str(val)
+    return key if key_name in CASE_SENSITIVE_KEYS else key.lower()
+
+# Normalisasi satu kolom kunci sekaligus (vektor), setara normalize_key per sel
+def normalize_key_series(key_name, series):
+    keys = series.astype("string").str.strip().str.replace("-", "", regex=False).str.replace(" ", "", regex=False)
+    if key_name not in CASE_SENSITIVE_KEYS:
+        # ISBN angka yang terbaca sebagai float (9786021234567.0)
+        keys = keys.str.replace(r"\.0$", "", regex=True).str.lower()
+    return keys.fillna("")
+
+# Ambil kunci penghapusan dari DataFrame, tanpa duplikat (seen dipakai lintas chunk)
+def build_deletion_keys(df, seen=None):
+    seen = set() if seen is None else seen
+    columns = [
+        normalize_key_series(key_name, df[label]) if label in df.columns
+        else pd.Series([""] * len(df), index=df.index, dtype="string")
+        for key_name, label in KEY_LABELS.items()
+    ]
+    keys = []
+    for key in zip(*columns):
+        if any(key) and key not in seen:
+            seen.add(key)
+            keys.append(key)
+    return keys
+
+def deletion_chunk_size_from_env():
+    return int(os.getenv("DELETION_CHUNK_SIZE", "50000"))
+
+DELETION_FILETYPES = [
+    ("Data penghapusan", "*.xlsx *.xlsm *.xls *.csv *.parquet"),
+    ("Excel files", "*.xlsx *.xlsm *.xls"),
+    ("CSV", "*.csv"),
+    ("Parquet", "*.parquet"),
+]
+
+# Baca file penghapusan per chunk, hanya kolom kunci -> DataFrame per chunk
+def iter_deletion_chunks(file_path, chunk_size=None):
+    chunk_size = chunk_size or deletion_chunk_size_from_env()
+    labels = list(KEY_LABELS.values())
+    ext = os.path.splitext(file_path)[1].lower()
+
+    if ext == ".csv":
+        yield from pd.read_csv(
+            file_path, usecols=lambda col: str(col).strip() in labels, dtype=str, chunksize=chunk_size
+        )
+    elif ext == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Membaca Parquet membutuhkan paket 'pyarrow' (pip install pyarrow)")
+        parquet_file = pq.ParquetFile(file_path)
+        columns = [label for label in labels if label in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    elif ext in (".xlsx", ".xlsm"):
+        # Mode read-only openpyxl: baris dibaca satu per satu, bukan seluruh workbook
+        from openpyxl import load_workbook
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = next(rows, ())
+            positions = {
+                str(name).strip(): i for i, name in enumerate(header) if name is not None
+            }
+            columns = [label for label in labels if label in positions]
+            indexes = [positions[label] for label in columns]
+            chunk = []
+            for row in rows:
+                chunk.append([row[i] if i < len(row) else None for i in indexes])
+                if len(chunk) >= chunk_size:
+                    yield pd.DataFrame(chunk, columns=columns, dtype=object)
+                    chunk = []
+            if chunk:
+                yield pd.DataFrame(chunk, columns=columns, dtype=object)
+        finally:
+            workbook.close()
+    else:
+        # .xls lama tidak didukung openpyxl, baca sekali tapi tetap hanya kolom kunci
+        yield pd.read_excel(file_path, usecols=lambda col: str(col).strip() in labels)
+
+# Kunci penghapusan dari file (xlsx/xls/csv/parquet) -> (kunci unik, jumlah baris)
+def read_deletion_keys(file_path, chunk_size=None):
+    keys = []
+    seen = set()
+    total_rows = 0
+    for chunk in iter_deletion_chunks(file_path, chunk_size):
+        chunk.columns = [str(col).strip() for col in chunk.columns]
+        total_rows += len(chunk)
+        keys += build_deletion_keys(chunk, seen)
+    return keys, total_rows
+
+# Indeks kunci penghapusan: nama_kunci -> {nilai: [nomor kunci]}, dibangun sekali per proses
+def build_deletion_index(deletion_keys):
+    index = {key_name: {} for key_name in KEY_COLUMNS}
+    for key_id, key in enumerate(deletion_keys):
+        for key_name, key_value in zip(KEY_COLUMNS, key):
+            if key_value:
+                index[key_name].setdefault(key_value, []).append(key_id)
+    return index
+
 # Setup credentials Google Sheets API
 def setup_sheets_api():
     load_dotenv()
-    creds_path = os.getenv("GOOGLE_CREDS_PATH")
-    scopes = ["https://www.googleapis.com/auth/spreadsheets"]
-    creds = Credentials.from_service_account_file(creds_path, scopes=scopes)
-    return build('sheets', 'v4', credentials=creds)
+    return fungsi_sheetsclient.get_sheets_service()
 
-# Fungsi batch hapus
-def batch_delete_rows(service, spreadsheet_id, sheet_id, rows_to_delete, logger=print):
+# Pencocok satu sheet yang menerima data per jendela baris (urut dari atas).
+# Tiap sel kunci dicari O(1) di indeks kunci penghapusan, sehingga sheet tidak perlu
+# disimpan utuh di memori.
+class SheetMatcher:
+    def __init__(self, deletion_index, mode=MODE_SEMUA):
+        if mode not in (MODE_SEMUA, MODE_PERTAMA):
+            raise ValueError(f"Mode hapus tidak dikenal: {mode}")
+        self.deletion_index = deletion_index
+        self.mode = mode
+        self.claimed = set()  # mode pertama: kunci yang sudah mendapat baris
+        self.data_rows = 0
+
+    # Cocokkan satu baris. cells: list (nama_kunci, nilai_kunci, [nomor kunci penghapusan])
+    # Hasil: (nomor_baris, nama_kunci, nilai_kunci) atau None
+    def match_row(self, row_number, cells):
+        match = None
+        for key_name, key_value, key_ids in cells:
+            if self.mode == MODE_PERTAMA:
+                key_ids = [key_id for key_id in key_ids if key_id not in self.claimed]
+                self.claimed.update(key_ids)
+            if key_ids and match is None:
+                match = (row_number, key_name, key_value)
+        return match
+
+    # columns: {nama_kunci: [nilai sel per baris mulai start_row]}
+    # Hasil: list (nomor_baris, nama_kunci, nilai_kunci) terurut
+    def feed(self, start_row, columns):
+        matches = []
+        height = max((len(values) for values in columns.values()), default=0)
+        if height:
+            self.data_rows = max(self.data_rows, start_row - FIRST_DATA_ROW + height)
+        for offset in range(height):
+            cells = []
+            for key_name, values in columns.items():
+                if offset >= len(values):
+                    continue
+                key_value = normalize_key(key_name, values[offset])
+                key_ids = self.deletion_index[key_name].get(key_value) if key_value else None
+                if key_ids:
+                    cells.append((key_name, key_value, key_ids))
+            match = self.match_row(start_row + offset, cells) if cells else None
+            if match:
+                matches.append(match)
+        return matches
+
+# Batas satu panggilan batchGet agar payload respons tetap wajar
+SHEET_RANGE_COLS = 28
+HEADER_ROW = 9
+
+# Batas jendela baris dan batchGet dibaca saat dipakai (setelah .env dimuat)
+def row_window_from_env():
+    return int(os.getenv("ROW_WINDOW", "5000"))
+
+def batch_get_max_ranges_from_env():
+    return int(os.getenv("BATCHGET_MAX_RANGES", "100"))
+
+def batch_get_max_cells_from_env():
+    return int(os.getenv("BATCHGET_MAX_CELLS", "1000000"))
+
+# Jumlah baris grid sheet dari metadata (gridProperties.rowCount)
+def sheet_row_count(sheet):
+    return sheet["properties"].get("gridProperties", {}).get("rowCount", 0)
+
+# Jumlah kolom grid sheet dari metadata (gridProperties.columnCount)
+def sheet_column_count(sheet):
+    return sheet["properties"].get("gridProperties", {}).get("columnCount", 0)
+
+# Pecah tiap sheet menjadi jendela baris (sheet, baris_awal, baris_akhir) sampai rowCount
+def plan_row_windows(sheets, window=None):
+    window = window or row_window_from_env()
+    windows = []
+    for sheet in sheets:
+        row_count = sheet_row_count(sheet)
+        for start in range(FIRST_DATA_ROW, row_count + 1, window):
+            windows.append((sheet, start, min(start + window - 1, row_count)))
+    return windows
+
+# Kelompokkan jendela ke beberapa batchGet berdasarkan jumlah range dan perkiraan sel
+def plan_batch_get_chunks(windows, max_ranges=None, max_cells=None, cols_per_window=len(KEY_COLUMNS)):
+    max_ranges = max_ranges or batch_get_max_ranges_from_env()
+    max_cells = max_cells or batch_get_max_cells_from_env()
+    chunks = []
+    current, current_cells = [], 0
+    for window in windows:
+        _, start, end = window
+        cells = (end - start + 1) * cols_per_window
+        if current and (
+            (len(current) + 1) * cols_per_window > max_ranges or current_cells + cells > max_cells
+        ):
+            chunks.append(current)
+            current, current_cells = [], 0
+        current.append(window)
+        current_cells += cells
+    if current:
+        chunks.append(current)
+    return chunks
+
+# Baca baris header (baris 9) semua sheet sekaligus -> {judul: {header huruf kecil: indeks kolom}}
+def read_sheet_headers(service, spreadsheet_id, sheets):
+    header_maps = {}
+    titles = [sheet["properties"]["title"] for sheet in sheets]
+    max_ranges = batch_get_max_ranges_from_env()
+    for start in range(0, len(titles), max_ranges):
+        chunk = titles[start:start + max_ranges]
+        result = scheduler.execute(service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=[f"{quote_sheet_title(title)}!{HEADER_ROW}:{HEADER_ROW}" for title in chunk],
+        ))
+        for title, value_range in zip(chunk, result.get("valueRanges", [])):
+            values = value_range.get("values", [])
+            headers = values[0] if values else []
+            header_map = {}
+            for i, h in enumerate(headers):
+                header_map.setdefault(str(h).strip().lower(), i)
+            header_maps[title] = header_map
+    return header_maps
+
+# Generator jendela kolom kunci: (sheet, baris_awal, baris_akhir, {nama_kunci: [nilai]}).
+# Jendela satu sheet selalu berurutan dari atas; hasil muncul begitu batchGet-nya selesai.
+def iter_key_windows(service, spreadsheet_id, sheets, header_maps, logger=print):
+    chunks = plan_batch_get_chunks(plan_row_windows(sheets))
+    for n, chunk in enumerate(chunks, start=1):
+        ranges = []
+        for sheet, start, end in chunk:
+            title = sheet["properties"]["title"]
+            for header in KEY_COLUMNS.values():
+                letter = column_letter(header_maps[title][header])
+                ranges.append(f"{quote_sheet_title(title)}!{letter}{start}:{letter}{end}")
+        result = scheduler.execute(service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=ranges,
+            majorDimension="COLUMNS",
+            valueRenderOption="UNFORMATTED_VALUE",
+        ))
+        logger(f"📥 batchGet {n}/{len(chunks)}: {len(chunk)} jendela baris dibaca")
+        value_ranges = iter(result.get("valueRanges", []))
+        for sheet, start, end in chunk:
+            columns = {}
+            for key_name in KEY_COLUMNS:
+                values = next(value_ranges, {}).get("values", [])
+                columns[key_name] = values[0] if values else []
+            yield sheet, start, end, columns
+
+# Nama sheet dalam format A1: diberi kutip, kutip di dalam judul digandakan
+def quote_sheet_title(title):
+    return "'" + title.replace("'", "''") + "'"
+
+# Huruf kolom dari indeks 0-based (0 -> A, 27 -> AB)
+def column_letter(col_idx):
+    letters = ""
+    col_idx += 1
+    while col_idx:
+        col_idx, rem = divmod(col_idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+# Baca A10:AB seluruh data satu sheet (dengan rumus) untuk mode kompaksi
+def read_sheet_rows(service, spreadsheet_id, title, row_count):
+    result = scheduler.execute(service.spreadsheets().values().get(
+        spreadsheetId=spreadsheet_id,
+        range=f"{quote_sheet_title(title)}!A{FIRST_DATA_ROW}:AB{max(row_count, FIRST_DATA_ROW)}",
+        valueRenderOption="FORMULA",
+    ))
+    return result.get("values", [])
+
+# Batas satu batchUpdate penghapusan
+def delete_max_requests_from_env():
+    return int(os.getenv("DELETE_MAX_REQUESTS", "500"))
+
+def delete_max_bytes_from_env():
+    return int(os.getenv("DELETE_MAX_BYTES", "1000000"))
+
+# Gabungkan nomor baris yang berurutan menjadi rentang (awal, akhir), urut dari bawah
+def coalesce_rows(rows):
+    ranges = []
+    for row in sorted(set(rows), reverse=True):
+        if ranges and ranges[-1][0] == row + 1:
+            ranges[-1][0] = row
+        else:
+            ranges.append([row, row])
+    return [(start, end) for start, end in ranges]
+
+# Susun request deleteDimension untuk semua sheet: {sheet_id: [nomor_baris]}.
+# Rentang tiap sheet diurutkan dari bawah supaya indeks berikutnya tidak bergeser.
+def plan_delete_requests(rows_by_sheet):
     requests = []
-    for row_idx in sorted(rows_to_delete, reverse=True):
-        requests.append({
-            "deleteDimension": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "dimension": "ROWS",
-                    "startIndex": row_idx - 1,
-                    "endIndex": row_idx
+    total_rows = 0
+    for sheet_id, rows in rows_by_sheet.items():
+        total_rows += len(set(rows))
+        for start, end in coalesce_rows(rows):
+            requests.append({
+                "deleteDimension": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "dimension": "ROWS",
+                        "startIndex": start - 1,
+                        "endIndex": end
+                    }
                 }
-            }
-        })
+            })
+    return requests, total_rows
 
+# Pecah daftar request menjadi beberapa batch sesuai batas jumlah dan ukuran
+def split_requests(requests, max_requests=None, max_bytes=None):
+    max_requests = max_requests or delete_max_requests_from_env()
+    max_bytes = max_bytes or delete_max_bytes_from_env()
+    batches = []
+    current, current_bytes = [], 0
+    for request in requests:
+        size = len(json.dumps(request))
+        if current and (len(current) >= max_requests or current_bytes + size > max_bytes):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(request)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+# Jalankan penghapusan semua sheet dalam batchUpdate sesedikit mungkin
+def execute_delete_plan(service, spreadsheet_id, rows_by_sheet, logger=print, failed_sheets=None, journal=None):
+    requests, total_rows = plan_delete_requests(rows_by_sheet)
     if not requests:
         logger("⚠️ Tidak ada baris untuk dihapus.")
         return 0
 
+    logger(
+        f"🧮 {total_rows} baris → {len(requests)} rentang hapus "
+        f"(hemat {total_rows - len(requests)} sub-request)"
+    )
+
+    deleted = 0
+    batches = split_requests(requests)
+    for n, batch in enumerate(batches, start=1):
+        batch_rows = sum(
+            r["deleteDimension"]["range"]["endIndex"] - r["deleteDimension"]["range"]["startIndex"]
+            for r in batch
+        )
+        try:
+            # deleteDimension per indeks tidak idempoten: hanya 429 (belum diproses server) yang diulang
+            scheduler.execute(service.spreadsheets().batchUpdate(
+                spreadsheetId=spreadsheet_id,
+                body={"requests": batch}
+            ), kind="write", retry_statuses=scheduler.RATE_LIMIT_STATUSES)
+            deleted += batch_rows
+            logger(f"✅ Batch {n}/{len(batches)}: berhasil hapus {batch_rows} baris.")
+            if journal is not None:
+                record_committed_batch(journal, batch)
+        except scheduler.RunStopped:
+            logger(f"⏹️ Dihentikan sebelum batch {n}/{len(batches)}, sisa batch tidak dikirim.")
+            if failed_sheets is not None:
+                failed_sheets.update(
+                    r["deleteDimension"]["range"]["sheetId"] for pending in batches[n - 1:] for r in pending
+                )
+            break
+        except Exception as e:
+            logger(f"❌ Batch {n}/{len(batches)}: gagal hapus baris: {e}")
+            if failed_sheets is not None:
+                failed_sheets.update(r["deleteDimension"]["range"]["sheetId"] for r in batch)
+    return deleted
+
+# Catat rentang batch yang sudah ter-commit ke jurnal run (nomor baris asli, inklusif)
+def record_committed_batch(journal, batch):
+    for r in batch:
+        dim = r["deleteDimension"]["range"]
+        entry = journal.sheet(dim["sheetId"])
+        journal.update_sheet(
+            dim["sheetId"], save=False,
+            deleted=entry.get("deleted", []) + [[dim["startIndex"] + 1, dim["endIndex"]]],
+        )
+    journal.save()
+
+# Cocokkan dengan scan penuh: jendela baris dicocokkan begitu tiba.
+# Hasil: ({sheet_id: [nomor_baris]}, {sheet_id: jumlah baris data})
+def match_by_scan(service, spreadsheet_id, sheets, header_maps, deletion_keys, mode, logger=print,
+                  matched_keys=None):
+    deletion_index = build_deletion_index(deletion_keys)
+    matchers = {}
+    matched_rows = {}
+    for sheet, start, end, columns in iter_key_windows(service, spreadsheet_id, sheets, header_maps, logger):
+        title = sheet['properties']['title']
+        sheet_id = sheet['properties']['sheetId']
+        if sheet_id not in matchers:
+            matchers[sheet_id] = SheetMatcher(deletion_index, mode)
+            matched_rows[sheet_id] = []
+        for row_number, key_name, key_value in matchers[sheet_id].feed(start, columns):
+            logger(f"🔍 Match: {KEY_LABELS[key_name]}='{key_value}' di sheet '{title}' (baris {row_number})")
+            matched_rows[sheet_id].append(row_number)
+            if matched_keys is not None:
+                matched_keys.setdefault(sheet_id, []).append((row_number, key_name, key_value))
+    return matched_rows, {sheet_id: m.data_rows for sheet_id, m in matchers.items()}
+
+# Scan sheet ke indeks lokal (kunci lama sheet tersebut diganti)
+def scan_sheets_into_index(conn, service, spreadsheet_id, sheets, header_maps, logger=print):
+    data_rows = {}
+    for sheet, start, end, columns in iter_key_windows(service, spreadsheet_id, sheets, header_maps, logger):
+        props = sheet['properties']
+        sheet_id = props['sheetId']
+        if start == FIRST_DATA_ROW:
+            fungsi_indekskatalog.begin_sheet(conn, spreadsheet_id, sheet_id)
+            data_rows[sheet_id] = 0
+        entries = []
+        for key_name, values in columns.items():
+            for i, val in enumerate(values):
+                key_value = normalize_key(key_name, val)
+                if key_value:
+                    entries.append((key_name, key_value, start + i))
+            if values:
+                data_rows[sheet_id] = max(data_rows[sheet_id], start - FIRST_DATA_ROW + len(values))
+        fungsi_indekskatalog.add_keys(conn, spreadsheet_id, sheet_id, entries)
+        if end >= sheet_row_count(sheet):
+            fungsi_indekskatalog.finish_sheet(
+                conn, spreadsheet_id, sheet_id, props['title'], sheet_row_count(sheet),
+                fungsi_indekskatalog.header_hash(header_maps[props['title']]), data_rows[sheet_id],
+            )
+
+# Cari baris lewat indeks lokal, dengan aturan mode yang sama seperti SheetMatcher
+def match_from_index(conn, spreadsheet_id, deletion_keys, mode):
+    matches = {}
+    matcher = None
+    current_sheet = current_row = None
+    cells = {}
+
+    def flush():
+        if cells:
+            match = matcher.match_row(current_row, [
+                (key_name, key_value, key_ids) for key_name, (key_value, key_ids) in cells.items()
+            ])
+            if match:
+                matches.setdefault(current_sheet, []).append(match)
+
+    for sheet_id, row_number, key_name, key_value, key_id in fungsi_indekskatalog.lookup(
+        conn, spreadsheet_id, deletion_keys, list(KEY_COLUMNS)
+    ):
+        if (sheet_id, row_number) != (current_sheet, current_row):
+            flush()
+            if sheet_id != current_sheet:
+                matcher = SheetMatcher(None, mode)
+            current_sheet, current_row, cells = sheet_id, row_number, {}
+        cells.setdefault(key_name, (key_value, []))[1].append(key_id)
+    flush()
+    return matches
+
+VERIFY_MAX_FILTERS = 500
+
+# Baca kunci baris data terakhir menurut indeks dan baris sesudahnya, per sheet sekaligus.
+# Hasil: {sheet_id: {nomor_baris: {nama_kunci: nilai}}} (sel kosong tidak dicatat, sama seperti indeks)
+def read_tail_keys(service, spreadsheet_id, sheets, header_maps, data_rows):
+    targets = []
+    for sheet in sheets:
+        sheet_id = sheet['properties']['sheetId']
+        if sheet_id not in data_rows:
+            continue
+        last_row = FIRST_DATA_ROW - 1 + data_rows[sheet_id]
+        first = max(last_row, FIRST_DATA_ROW)
+        last = min(last_row + 1, sheet_row_count(sheet))
+        if first <= last:
+            targets.append((sheet, first, last))
+    tails = {}
+    per_request = max(1, batch_get_max_ranges_from_env() // len(KEY_COLUMNS))
+    for start in range(0, len(targets), per_request):
+        chunk = targets[start:start + per_request]
+        ranges = []
+        for sheet, first, last in chunk:
+            title = sheet['properties']['title']
+            for header in KEY_COLUMNS.values():
+                letter = column_letter(header_maps[title][header])
+                ranges.append(f"{quote_sheet_title(title)}!{letter}{first}:{letter}{last}")
+        result = scheduler.execute(service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=ranges,
+            majorDimension="COLUMNS",
+            valueRenderOption="UNFORMATTED_VALUE",
+        ))
+        value_ranges = iter(result.get("valueRanges", []))
+        for sheet, first, last in chunk:
+            rows = {row: {} for row in range(first, last + 1)}
+            for key_name in KEY_COLUMNS:
+                values = next(value_ranges, {}).get("values", [])
+                for i, val in enumerate(values[0] if values else []):
+                    key_value = normalize_key(key_name, val)
+                    if key_value:
+                        rows[first + i][key_name] = key_value
+            tails[sheet['properties']['sheetId']] = rows
+    return tails
+
+# Pastikan baris hasil indeks masih berisi kunci yang sama di sheet -> set sheet_id yang tidak cocok
+def verify_matches(service, spreadsheet_id, sheets_by_id, header_maps, matches):
+    targets = [
+        (sheet_id, row_number, key_name, key_value)
+        for sheet_id, sheet_matches in matches.items()
+        for row_number, key_name, key_value in sheet_matches
+    ]
+    mismatched = set()
+    for start in range(0, len(targets), VERIFY_MAX_FILTERS):
+        chunk = targets[start:start + VERIFY_MAX_FILTERS]
+        result = scheduler.execute(service.spreadsheets().values().batchGetByDataFilter(
+            spreadsheetId=spreadsheet_id,
+            body={
+                "dataFilters": [
+                    {"a1Range": f"{quote_sheet_title(sheets_by_id[sheet_id]['properties']['title'])}!A{row}:AB{row}"}
+                    for sheet_id, row, _, _ in chunk
+                ],
+                "majorDimension": "ROWS",
+                "valueRenderOption": "UNFORMATTED_VALUE",
+            },
+        ))
+        for (sheet_id, row, key_name, key_value), value_range in zip(chunk, result.get("valueRanges", [])):
+            values = value_range.get("valueRange", {}).get("values", [])
+            row_values = values[0] if values else []
+            title = sheets_by_id[sheet_id]['properties']['title']
+            col_idx = header_maps[title][KEY_COLUMNS[key_name]]
+            cell = row_values[col_idx] if col_idx < len(row_values) else ""
+            if normalize_key(key_name, cell) != key_value:
+                mismatched.add(sheet_id)
+    return mismatched
+
+# Cocokkan lewat indeks lokal: scan ulang hanya sheet yang berubah, lalu verifikasi hasilnya.
+# Hasil sama seperti match_by_scan.
+def match_with_index(conn, service, spreadsheet_id, sheets, header_maps, deletion_keys, mode, logger=print,
+                     matched_keys=None):
+    sheets_by_id = {sheet['properties']['sheetId']: sheet for sheet in sheets}
+    fungsi_indekskatalog.forget_missing_sheets(conn, spreadsheet_id, list(sheets_by_id))
+    stale = fungsi_indekskatalog.stale_sheet_ids(conn, spreadsheet_id, [
+        (
+            sheet_id, sheet['properties']['title'], sheet_row_count(sheet),
+            fungsi_indekskatalog.header_hash(header_maps[sheet['properties']['title']]),
+        )
+        for sheet_id, sheet in sheets_by_id.items()
+    ])
+    # Baris baru yang diketik di baris kosong grid (rowCount tetap) atau kunci terakhir yang dikoreksi
+    fresh = [sheet for sheet_id, sheet in sheets_by_id.items() if sheet_id not in stale]
+    tails = read_tail_keys(
+        service, spreadsheet_id, fresh, header_maps, fungsi_indekskatalog.sheet_data_rows(conn, spreadsheet_id)
+    )
+    stale |= fungsi_indekskatalog.changed_tail_sheet_ids(conn, spreadsheet_id, tails)
+    logger(f"🗂️ Indeks lokal: {len(stale)} dari {len(sheets_by_id)} sheet perlu di-scan ulang")
+    with fungsi_trace.step("indeks"):
+        scan_sheets_into_index(
+            conn, service, spreadsheet_id, [sheets_by_id[sheet_id] for sheet_id in sheets_by_id if sheet_id in stale],
+            header_maps, logger,
+        )
+
+    matches = match_from_index(conn, spreadsheet_id, deletion_keys, mode)
+    with fungsi_trace.step("verifikasi"):
+        mismatched = verify_matches(service, spreadsheet_id, sheets_by_id, header_maps, matches) - stale
+    if mismatched:
+        logger(f"♻️ Indeks {len(mismatched)} sheet tidak sesuai isi sheet, scan ulang...")
+        for sheet_id in mismatched:
+            fungsi_indekskatalog.invalidate_sheet(conn, spreadsheet_id, sheet_id)
+        with fungsi_trace.step("indeks"):
+            scan_sheets_into_index(
+                conn, service, spreadsheet_id, [sheets_by_id[sheet_id] for sheet_id in mismatched],
+                header_maps, logger,
+            )
+        matches = match_from_index(conn, spreadsheet_id, deletion_keys, mode)
+
+    matched_rows = {}
+    for sheet_id, sheet_matches in matches.items():
+        title = sheets_by_id[sheet_id]['properties']['title']
+        for row_number, key_name, key_value in sheet_matches:
+            logger(f"🔍 Match: {KEY_LABELS[key_name]}='{key_value}' di sheet '{title}' (baris {row_number})")
+        matched_rows[sheet_id] = [row_number for row_number, _, _ in sheet_matches]
+    if matched_keys is not None:
+        matched_keys.update(matches)
+    return matched_rows, fungsi_indekskatalog.sheet_data_rows(conn, spreadsheet_id)
+
+# Mode kompaksi: dipakai otomatis bila porsi baris terhapus di sheet >= ambang ini
+COMPACTION_THRESHOLD = 0.2
+# Token rumus: teks literal dilewati; referensi A1 (opsional dengan nama sheet) berupa sel, rentang sel
+# (boleh terbuka: A10:B) atau rentang baris (10:12). Nama fungsi (LOG10) dan nama sheet tidak dianggap sel.
+FORMULA_TOKEN = re.compile(r"""
+    (?P<string>"(?:[^"]|"")*")
+  | (?<![A-Za-z0-9_.$'!])
+    (?:(?P<sheet>'(?:[^']|'')+'|[A-Za-z_][A-Za-z0-9_.]*)!)?
+    (?P<ref>
+        \$?[A-Za-z]{1,3}\$?[0-9]+(?::\$?[A-Za-z]{1,3}(?:\$?[0-9]+)?)?
+      | \$?[0-9]+:\$?[0-9]+
+    )
+    (?![A-Za-z0-9_.(!'])
+""", re.VERBOSE)
+REFERENCE_PART = re.compile(r"(\$?[A-Za-z]{0,3}\$?)([0-9]*)")
+
+# Peta nomor baris lama -> baru setelah baris dihapus, sama seperti deleteDimension menggeser referensi.
+# step 0: sel tunggal (None bila barisnya terhapus); +1/-1: ujung awal/akhir rentang, bergeser ke
+# baris tersisa terdekat di dalam rentang.
+def build_row_mapper(total_rows, rows_to_delete, start_row=FIRST_DATA_ROW):
+    deleted = set(rows_to_delete)
+    last_row = start_row + total_rows - 1
+    new_rows = {}
+    for old_row in range(start_row, last_row + 1):
+        if old_row not in deleted:
+            new_rows[old_row] = start_row + len(new_rows)
+    removed = total_rows - len(new_rows)
+
+    def map_row(row, step=0):
+        while True:
+            if row < start_row:
+                return row
+            if row > last_row:
+                return row - removed
+            if row in new_rows:
+                return new_rows[row]
+            if step == 0:
+                return None
+            row += step
+    return map_row
+
+# Sesuaikan semua referensi baris ke sheet ini di satu rumus (mis. =Y15*Z15 -> =Y12*Z12,
+# =SUM($Y$15:Y15) -> =SUM($Y$12:Y12)). Referensi ke sheet lain tidak diubah.
+def shift_row_references(value, map_row, title=None):
+    if not isinstance(value, str) or not value.startswith("="):
+        return value
+
+    def replace(match):
+        if match.group("string"):
+            return match.group(0)
+        sheet = match.group("sheet")
+        if sheet:
+            name = sheet[1:-1].replace("''", "'") if sheet.startswith("'") else sheet
+            if name != title:
+                return match.group(0)
+        parts = [REFERENCE_PART.fullmatch(part).groups() for part in match.group("ref").split(":")]
+        if len(parts) == 1:
+            steps = [0]
+        else:
+            steps = [1, -1]
+        new_rows = [
+            map_row(int(row), step) if row else None
+            for (_, row), step in zip(parts, steps)
+        ]
+        if any(row and new_row is None for (_, row), new_row in zip(parts, new_rows)):
+            return "#REF!"
+        if len(new_rows) == 2 and all(new_rows) and new_rows[0] > new_rows[1]:
+            return "#REF!"
+        ref = ":".join(
+            prefix + (str(new_row) if row else "")
+            for (prefix, row), new_row in zip(parts, new_rows)
+        )
+        return (sheet + "!" if sheet else "") + ref
+
+    return FORMULA_TOKEN.sub(replace, value)
+
+# Hitung baris yang tersisa setelah penghapusan, dengan rumus yang sudah disesuaikan
+def compact_rows(rows, rows_to_delete, start_row=FIRST_DATA_ROW, width=SHEET_RANGE_COLS, title=None):
+    deleted = set(rows_to_delete)
+    map_row = build_row_mapper(len(rows), deleted, start_row)
+    survivors = []
+    for i, row in enumerate(rows):
+        if i + start_row in deleted:
+            continue
+        padded = list(row) + [""] * (width - len(row))
+        survivors.append([shift_row_references(val, map_row, title) for val in padded])
+    return survivors
+
+# CellData bertipe dari nilai FORMULA: angka tetap angka, teks tetap teks (nol di depan ISBN
+# tidak hilang), rumus hanya untuk teks berawalan "=". Sel kosong dikosongkan.
+def cell_data(value):
+    if value == "" or value is None:
+        return {}
+    if isinstance(value, bool):
+        return {"userEnteredValue": {"boolValue": value}}
+    if isinstance(value, (int, float)):
+        return {"userEnteredValue": {"numberValue": value}}
+    if isinstance(value, str) and value.startswith("="):
+        return {"userEnteredValue": {"formulaValue": value}}
+    return {"userEnteredValue": {"stringValue": str(value)}}
+
+# Request updateCells untuk menulis baris hasil kompaksi mulai FIRST_DATA_ROW (hanya nilai, format tetap)
+def build_compaction_request(sheet_id, survivors):
+    return {
+        "updateCells": {
+            "start": {"sheetId": sheet_id, "rowIndex": FIRST_DATA_ROW - 1, "columnIndex": 0},
+            "rows": [{"values": [cell_data(val) for val in row]} for row in survivors],
+            "fields": "userEnteredValue",
+        }
+    }
+
+# Tulis ulang baris yang tersisa ke A10:AB dan pangkas baris ekor dalam SATU batchUpdate, sehingga
+# sheet tidak pernah tertinggal dengan baris ekor ganda bila run berhenti di tengah jalan.
+# Hanya kolom A:AB yang dipindah, jadi kompaksi hanya dipakai untuk sheet selebar SHEET_RANGE_COLS.
+# Hasil: (baris_ekor_awal, baris_ekor_akhir) yang sudah terhapus, atau None bila kompaksi tidak jadi
+# dipakai (sheet belum berubah, baris cocok dihapus dengan cara biasa).
+def compact_sheet(service, spreadsheet_id, sheet_id, title, row_count, rows_to_delete, logger=print):
     try:
-        service.spreadsheets().batchUpdate(
+        rows = read_sheet_rows(service, spreadsheet_id, title, row_count)
+    except scheduler.RunStopped:
+        raise
+    except Exception as e:
+        logger(f"⚠️ Kompaksi sheet '{title}' gagal membaca data, kembali ke hapus per rentang: {e}")
+        return None
+    survivors = compact_rows(rows, rows_to_delete, title=title)
+    first_tail_row = FIRST_DATA_ROW + len(survivors)
+    last_row = FIRST_DATA_ROW + len(rows) - 1
+    if first_tail_row > last_row:
+        return None
+
+    requests = [build_compaction_request(sheet_id, survivors)] if survivors else []
+    requests += plan_delete_requests({sheet_id: range(first_tail_row, last_row + 1)})[0]
+    try:
+        # Berisi deleteDimension: hanya 429 yang diulang (lihat execute_delete_plan)
+        scheduler.execute(service.spreadsheets().batchUpdate(
             spreadsheetId=spreadsheet_id,
-            body={"requests": requests}
-        ).execute()
-        logger(f"✅ Berhasil hapus {len(rows_to_delete)} baris.")
-        return len(rows_to_delete)
+            body={"requests": requests},
+        ), kind="write", retry_statuses=scheduler.RATE_LIMIT_STATUSES)
+    except scheduler.RunStopped:
+        raise
     except Exception as e:
-        logger(f"❌ Gagal hapus baris: {e}")
-        return 0
+        logger(f"⚠️ Kompaksi sheet '{title}' gagal, kembali ke hapus per rentang: {e}")
+        return None
+
+    logger(f"🧱 Kompaksi sheet '{title}': {len(survivors)} baris ditulis ulang, "
+           f"baris {first_tail_row}-{last_row} dipangkas")
+    return first_tail_row, last_row
+
+# Fungsi batch hapus untuk satu sheet
+def batch_delete_rows(service, spreadsheet_id, sheet_id, rows_to_delete, logger=print):
+    return execute_delete_plan(service, spreadsheet_id, {sheet_id: rows_to_delete}, logger)
+
+# Lanjutkan penghapusan run terakhir dari jurnal: hanya rentang yang belum ter-commit.
+# Sheet yang berubah sejak run terakhir (rowCount atau isi kunci tidak cocok) tidak disentuh.
+def resume_delete_plan(service, spreadsheet_id, journal, metadata, logger=print):
+    rows_by_sheet = {}
+    pending = {}
+    for sheet_key, entry in journal.data["sheets"].items():
+        sheet_id = int(sheet_key)
+        deleted = [range(start, end + 1) for start, end in entry.get("deleted", [])]
+        remaining = [row for row in entry["rows"] if not any(row in r for r in deleted)]
+        if not remaining:
+            continue
+        sheet = metadata.sheet(sheet_id=sheet_id)
+        expected_row_count = entry["row_count"] - sum(len(r) for r in deleted)
+        if sheet is None or sheet_row_count(sheet) != expected_row_count:
+            logger(f"⚠️ Sheet '{entry['title']}' berubah sejak run terakhir. Dilewati, jalankan ulang penghapusan.")
+            continue
+        pending[sheet_id] = (sheet, entry, remaining)
+
+    # Baris hasil pencocokan (bukan hasil kompaksi) dicek ulang isinya sebelum dihapus
+    sheets_by_id = {sheet_id: sheet for sheet_id, (sheet, _, _) in pending.items()}
+    matches = {
+        sheet_id: [tuple(match) for match in entry["matches"] if match[0] in remaining]
+        for sheet_id, (_, entry, remaining) in pending.items() if not entry.get("compacted")
+    }
+    if matches:
+        header_maps = read_sheet_headers(service, spreadsheet_id, [sheets_by_id[sheet_id] for sheet_id in matches])
+        with fungsi_trace.step("verifikasi"):
+            mismatched = verify_matches(service, spreadsheet_id, sheets_by_id, header_maps, matches)
+    else:
+        mismatched = set()
+    for sheet_id, (sheet, entry, remaining) in pending.items():
+        if sheet_id in mismatched:
+            logger(f"⚠️ Isi sheet '{entry['title']}' berubah sejak run terakhir. Dilewati, jalankan ulang penghapusan.")
+            continue
+        logger(f"↩️ Sheet '{sheet['properties']['title']}': {len(remaining)} baris tersisa untuk dihapus")
+        rows_by_sheet[sheet_id] = remaining
+    return rows_by_sheet
 
 # Fungsi utama
-def main_hapus_pengadaan(logger=print):
-    logger("📤 Silakan pilih file Excel (.xlsx) yang berisi data penghapusan...")
-    file_path = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx *.xls")])
+@fungsi_trace.traced_run("hapus")
+def main_hapus_pengadaan(logger=print, mode=None, compaction_threshold=None, use_index=None, file_path=None,
+                         resume=False):
+    # .env dimuat dulu: SPREADSHEET_ID dan pengaturan lain dibaca sebelum service dibuat
+    load_dotenv()
+    spreadsheet_id = os.getenv("SPREADSHEET_ID")
+    journal = None
+    if resume:
+        journal = fungsi_journal.load_unfinished("hapus", spreadsheet_id)
+        if journal is None:
+            logger("ℹ️ Tidak ada run Hapus Pengadaan yang bisa dilanjutkan.")
+            return
+        if journal.step_done("rencana"):
+            return resume_hapus_pengadaan(journal, logger)
+        # Run terakhir berhenti sebelum ada baris yang dihapus: ulangi dengan parameter yang sama
+        logger("↩️ Run terakhir berhenti sebelum penghapusan dimulai, diulang dengan file yang sama")
+        params = journal.params
+        mode, compaction_threshold = params["mode"], params["compaction_threshold"]
+        use_index, file_path = params["use_index"], params["file_path"]
+
+    mode = mode or os.getenv("MODE_HAPUS", MODE_SEMUA)
+    if use_index is None:
+        use_index = os.getenv("HAPUS_INDEX", "0") == "1"
+    if compaction_threshold is None:
+        compaction_threshold = float(os.getenv("COMPACTION_THRESHOLD", COMPACTION_THRESHOLD))
+    if file_path is None:
+        logger("📤 Silakan pilih file (.xlsx/.csv/.parquet) yang berisi data penghapusan...")
+        file_path = filedialog.askopenfilename(filetypes=DELETION_FILETYPES)
     if not file_path:
         logger("❌ Tidak ada file dipilih. Proses dibatalkan.")
         return
 
-    df = pd.read_excel(file_path)
+    with fungsi_trace.step("baca file"):
+        deletion_keys, total_rows = read_deletion_keys(file_path)
     logger(f"✅ File dibaca: {file_path}")
-    logger(f"🔍 Jumlah data: {len(df)}")
-    
+    logger(f"🔍 Jumlah data: {total_rows}")
+
+    logger(f"🔑 Jumlah kunci unik: {len(deletion_keys)} (mode: {mode})")
 
     service = setup_sheets_api()
-    spreadsheet_id = os.getenv("SPREADSHEET_ID")
-    logger(f"📂 Nama Spreadsheet: {spreadsheet_id.title}")
     if not spreadsheet_id:
         logger("❌ SPREADSHEET_ID tidak ditemukan di environment.")
         return
 
-    spreadsheet = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-    sheets = spreadsheet.get('sheets', [])
+    if fungsi_journal.has_unfinished("hapus", spreadsheet_id):
+        logger("⚠️ Run terakhir belum selesai dan akan diganti run ini (tidak bisa dilanjutkan lagi).")
+    journal = fungsi_journal.start("hapus", spreadsheet_id, {
+        "file_path": os.path.abspath(file_path), "mode": mode,
+        "compaction_threshold": compaction_threshold, "use_index": use_index,
+    })
+    try:
+        run_hapus_pengadaan(
+            service, spreadsheet_id, journal, deletion_keys, mode, compaction_threshold, use_index, logger
+        )
+    except scheduler.RunStopped:
+        journal.finish(fungsi_journal.STATUS_STOPPED)
+        logger(RESUME_HINT_STOPPED)
+    except Exception:
+        journal.finish(fungsi_journal.STATUS_FAILED)
+        logger(RESUME_HINT_FAILED)
+        raise
+
+def run_hapus_pengadaan(service, spreadsheet_id, journal, deletion_keys, mode, compaction_threshold, use_index,
+                        logger=print):
+    scheduler.get_scheduler().reset_stats()
+    with fungsi_trace.step("metadata"):
+        metadata = fungsi_metadata.get_metadata(spreadsheet_id, refresh=True, service=service)
+    logger(f"📂 Nama Spreadsheet: {metadata.title}")
+    sheets = metadata.sheets
     excluded_sheets = os.getenv("EXCLUDED_SHEETS", "")
     excluded_sheets = [s.strip() for s in excluded_sheets.split(",") if s.strip()]
-    total_deleted = 0
-
+    target_sheets = []
     for sheet in sheets:
         title = sheet['properties']['title']
-        sheet_id = sheet['properties']['sheetId']
-
         if title in excluded_sheets:
             logger(f"➡️ Sheet '{title}' dilewati karena termasuk excluded_sheets.")
             continue
+        target_sheets.append(sheet)
 
-        result = service.spreadsheets().values().get(
-            spreadsheetId=spreadsheet_id,
-            range=f"'{title}'!A1:AB9000"
-        ).execute()
-
-        all_data = result.get('values', [])
-        if len(all_data) < 10:
+    # Baris header dulu, lalu hanya kolom kunci dari sheet yang punya semua kolom penting
+    with fungsi_trace.step("header"):
+        header_maps = read_sheet_headers(service, spreadsheet_id, target_sheets)
+    keyed_sheets = []
+    for sheet in target_sheets:
+        title = sheet['properties']['title']
+        if sheet_row_count(sheet) < FIRST_DATA_ROW:
             logger(f"⚠️ Sheet '{title}' tidak memiliki cukup baris. Dilewati.")
             continue
-
-        headers = all_data[8]
-        rows = all_data[9:]
-        header_map = {h.strip().lower(): i for i, h in enumerate(headers)}
-        required_cols = [
-           # "judul*",
-            "isbn cetak", "isbn elektronik*", "uuid"]
-        if not all(col in header_map for col in required_cols):
+        if not all(col in header_maps.get(title, {}) for col in KEY_COLUMNS.values()):
             logger(f"⚠️ Sheet '{title}' tidak memiliki semua kolom penting. Dilewati.")
             continue
+        keyed_sheets.append(sheet)
 
-     #   idx_judul = header_map["judul*"]
-        idx_isbn = header_map["isbn cetak"]
-        idx_isbn_e = header_map["isbn elektronik*"]
-        idx_uuid = header_map["uuid"]
-
-        rows_to_delete = []
-
-        for index, row_excel in df.iterrows():
-            uuid = safe_str(row_excel.get("UUID"))
-        #    judul = safe_str(row_excel.get("Judul*")).lower()
-            isbn = safe_str(row_excel.get("ISBN Cetak")).lower()
-            isbn_e = safe_str(row_excel.get("ISBN Elektronik*")).lower()
-
-            for i, row_sheet in enumerate(rows):
-                try:
-             #       row_judul = safe_str(row_sheet[idx_judul]).lower()
-                    row_isbn = safe_str(row_sheet[idx_isbn]).lower()
-                    row_isbn_e = safe_str(row_sheet[idx_isbn_e]).lower()
-                    row_uuid = safe_str(row_sheet[idx_uuid])
-                except IndexError:
-                    continue
+    matched_keys = {}
+    conn = fungsi_indekskatalog.open_index() if use_index else None
+    if conn is not None:
+        matched_rows, data_rows = match_with_index(
+            conn, service, spreadsheet_id, keyed_sheets, header_maps, deletion_keys, mode, logger, matched_keys
+        )
+    else:
+        with fungsi_trace.step("scan"):
+            matched_rows, data_rows = match_by_scan(
+                service, spreadsheet_id, keyed_sheets, header_maps, deletion_keys, mode, logger, matched_keys
+            )
 
-                if (
-                    (uuid and uuid == row_uuid)
-                #    or (judul and judul == row_judul)
-                    or (isbn and isbn == row_isbn)
-                    or (isbn_e and isbn_e == row_isbn_e)
-                ):
-                   # logger(f"🔍 Match: UUID='{uuid}', Judul='{judul}' di sheet '{title}'")
-                    logger(f"🔍 Match: UUID='{uuid}' di sheet '{title}'")
-                    real_row_number = i + 10
-                    rows_to_delete.append(real_row_number)
-                    break  # keluar dari loop sheet, lanjut ke baris Excel berikutnya
+    # Rencana per sheet dicatat sebelum ada yang ditulis, supaya run bisa dilanjutkan
+    for sheet in keyed_sheets:
+        sheet_id = sheet['properties']['sheetId']
+        if matched_rows.get(sheet_id) and data_rows.get(sheet_id):
+            journal.update_sheet(
+                sheet_id, save=False, title=sheet['properties']['title'], row_count=sheet_row_count(sheet),
+                matches=matched_keys.get(sheet_id, []), rows=sorted(set(matched_rows[sheet_id])),
+            )
+    journal.mark_step("rencana")
 
+    rows_by_sheet = {}
+    compacted = {}
+    for sheet in keyed_sheets:
+        title = sheet['properties']['title']
+        sheet_id = sheet['properties']['sheetId']
+        rows_to_delete = matched_rows.get(sheet_id, [])
+        if not data_rows.get(sheet_id):
+            logger(f"⚠️ Sheet '{title}' tidak memiliki cukup baris. Dilewati.")
+            continue
         if not rows_to_delete:
             logger(f"⚠️ Tidak ditemukan baris cocok di sheet '{title}'.")
+            continue
+        if len(rows_to_delete) / data_rows[sheet_id] >= compaction_threshold:
+            if sheet_column_count(sheet) > SHEET_RANGE_COLS:
+                logger(f"ℹ️ Sheet '{title}' punya kolom setelah AB, kompaksi tidak dipakai.")
+            else:
+                with fungsi_trace.step("kompaksi", sheet=title):
+                    tail = compact_sheet(
+                        service, spreadsheet_id, sheet_id, title, sheet_row_count(sheet), rows_to_delete, logger
+                    )
+                if tail is not None:
+                    # Tulis ulang + pangkas ekor sudah ter-commit bersama: sheet ini selesai
+                    first_tail_row, last_row = tail
+                    journal.update_sheet(
+                        sheet_id, rows=list(range(first_tail_row, last_row + 1)),
+                        deleted=[[first_tail_row, last_row]], compacted=True,
+                    )
+                    compacted[sheet_id] = last_row - first_tail_row + 1
+                    continue
+        rows_by_sheet[sheet_id] = rows_to_delete
+
+    # Sheet hasil kompaksi tidak ikut rencana deleteDimension di bawah, jadi hitungan
+    # "hemat N sub-request" hanya untuk sheet yang dihapus per rentang
+    if compacted:
+        logger(
+            f"🧱 Kompaksi {len(compacted)} sheet: {sum(compacted.values())} baris dihapus "
+            f"({len(compacted)} batchUpdate, 1 per sheet)"
+        )
+    failed_sheets = set()
+    total_deleted = sum(compacted.values())
+    if rows_by_sheet or not compacted:
+        with fungsi_trace.step("hapus baris"):
+            total_deleted += execute_delete_plan(
+                service, spreadsheet_id, rows_by_sheet, logger, failed_sheets, journal
+            )
+
+    # Geser indeks lokal sesuai baris yang benar-benar terhapus
+    if conn is not None:
+        for sheet in keyed_sheets:
+            sheet_id = sheet['properties']['sheetId']
+            if sheet_id not in rows_by_sheet and sheet_id not in compacted:
+                continue
+            if sheet_id in failed_sheets:
+                fungsi_indekskatalog.invalidate_sheet(conn, spreadsheet_id, sheet_id)
+                continue
+            deleted_rows = set(matched_rows[sheet_id])
+            fungsi_indekskatalog.apply_row_deletions(
+                conn, spreadsheet_id, sheet_id, coalesce_rows(deleted_rows),
+                sheet_row_count(sheet) - len(deleted_rows),
+            )
+        conn.close()
+
+    # Cache metadata ikut diperbarui; dibuang bila ada batch yang gagal
+    for sheet in keyed_sheets:
+        sheet_id = sheet['properties']['sheetId']
+        if sheet_id in compacted:
+            metadata.set_row_count(sheet_id, sheet_row_count(sheet) - compacted[sheet_id])
+        elif sheet_id in rows_by_sheet and sheet_id not in failed_sheets:
+            metadata.set_row_count(sheet_id, sheet_row_count(sheet) - len(set(rows_by_sheet[sheet_id])))
+    if failed_sheets:
+        fungsi_metadata.invalidate(spreadsheet_id)
+
+    logger(f"🎯 Total baris dihapus di semua sheet: {total_deleted}")
+    logger(scheduler.get_scheduler().summary())
+    finish_journal(journal, failed_sheets, logger)
 
-        deleted_count = batch_delete_rows(service, spreadsheet_id, sheet_id, rows_to_delete, logger)
-        total_deleted += deleted_count
-        time.sleep(1)
+def resume_hapus_pengadaan(journal, logger=print):
+    service = setup_sheets_api()
+    spreadsheet_id = journal.spreadsheet_id
+    logger(f"↩️ Melanjutkan penghapusan run terakhir ({journal.params['file_path']})")
+    try:
+        scheduler.get_scheduler().reset_stats()
+        with fungsi_trace.step("metadata"):
+            metadata = fungsi_metadata.get_metadata(spreadsheet_id, refresh=True, service=service)
+        rows_by_sheet = resume_delete_plan(service, spreadsheet_id, journal, metadata, logger)
+        failed_sheets = set()
+        with fungsi_trace.step("hapus baris"):
+            total_deleted = execute_delete_plan(
+                service, spreadsheet_id, rows_by_sheet, logger, failed_sheets, journal
+            )
+    except scheduler.RunStopped:
+        journal.finish(fungsi_journal.STATUS_STOPPED)
+        logger(RESUME_HINT_STOPPED)
+        return
+    except Exception:
+        journal.finish(fungsi_journal.STATUS_FAILED)
+        logger(RESUME_HINT_FAILED)
+        raise
+
+    # Indeks lokal sheet yang disentuh tidak bisa digeser dengan pasti: scan ulang di run berikutnya
+    conn = fungsi_indekskatalog.open_index()
+    for sheet_key in journal.data["sheets"]:
+        fungsi_indekskatalog.invalidate_sheet(conn, spreadsheet_id, int(sheet_key))
+    conn.close()
+    fungsi_metadata.invalidate(spreadsheet_id)
 
     logger(f"🎯 Total baris dihapus di semua sheet: {total_deleted}")
+    logger(scheduler.get_scheduler().summary())
+    finish_journal(journal, failed_sheets, logger)
+
+RESUME_HINT_STOPPED = "⏹️ Proses dihentikan oleh pengguna. Gunakan 'Lanjutkan run terakhir' untuk meneruskan."
+RESUME_HINT_FAILED = "❌ Proses gagal. Gunakan 'Lanjutkan run terakhir' untuk mengulang sisanya."
+
+def finish_journal(journal, failed_sheets, logger=print):
+    if get_stop_requested():
+        journal.finish(fungsi_journal.STATUS_STOPPED)
+        logger(RESUME_HINT_STOPPED)
+    elif failed_sheets:
+        journal.finish(fungsi_journal.STATUS_FAILED)
+        logger("⚠️ Ada batch yang gagal. Gunakan 'Lanjutkan run terakhir' untuk mengulang sisanya.")
+    else:
+        journal.finish(fungsi_journal.STATUS_DONE)
 
 if __name__ == "__main__":
     main_hapus_pengadaan()
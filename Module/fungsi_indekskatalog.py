@@ -0,0 +1,172 @@
+import os
+import time
+import json
+import hashlib
+import sqlite3
+from globals import repo_path
+
+# Indeks katalog lokal (SQLite): kunci ternormalisasi -> (sheet, baris) untuk seluruh spreadsheet.
+# Dibangun dari scan penuh, diperbarui per sheet bila judul, rowCount, header atau isi kunci
+# baris terakhir berubah, dan digeser secara lokal setelah baris dihapus supaya tetap sesuai dengan sheet.
+# Koreksi kunci di tengah sheet (tanpa perubahan lain) tidak terdeteksi sampai indeks kedaluwarsa,
+# karena itu indeks hanya dipakai bila diminta (HAPUS_INDEX=1).
+
+def index_path_from_env():
+    """Lokasi file indeks (relatif terhadap folder repo)"""
+    return repo_path(os.getenv("HAPUS_INDEX_PATH", ".katalog_index.sqlite"))
+
+def max_age_hours_from_env():
+    return float(os.getenv("HAPUS_INDEX_MAX_AGE_HOURS", "24"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sheets (
+    spreadsheet_id TEXT NOT NULL,
+    sheet_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    header_hash TEXT NOT NULL,
+    data_rows INTEGER NOT NULL,
+    scanned_at REAL NOT NULL,
+    PRIMARY KEY (spreadsheet_id, sheet_id)
+);
+CREATE TABLE IF NOT EXISTS keys (
+    spreadsheet_id TEXT NOT NULL,
+    sheet_id INTEGER NOT NULL,
+    key_name TEXT NOT NULL,
+    key_value TEXT NOT NULL,
+    row_number INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS keys_lookup ON keys (spreadsheet_id, key_name, key_value);
+CREATE INDEX IF NOT EXISTS keys_rows ON keys (spreadsheet_id, sheet_id, row_number);
+"""
+
+def open_index(path=None):
+    """Buka (atau buat) file indeks"""
+    conn = sqlite3.connect(path or index_path_from_env())
+    conn.executescript(SCHEMA)
+    return conn
+
+def header_hash(header_map):
+    return hashlib.sha1(json.dumps(header_map, sort_keys=True).encode("utf-8")).hexdigest()
+
+def stale_sheet_ids(conn, spreadsheet_id, sheets, max_age_hours=None):
+    """sheet_id yang perlu di-scan ulang: belum ada, judul/rowCount/header berubah, atau kedaluwarsa.
+    sheets: list (sheet_id, title, row_count, header_hash)"""
+    stored = {
+        row[0]: row[1:]
+        for row in conn.execute(
+            "SELECT sheet_id, title, row_count, header_hash, scanned_at FROM sheets WHERE spreadsheet_id = ?",
+            (spreadsheet_id,),
+        )
+    }
+    if max_age_hours is None:
+        max_age_hours = max_age_hours_from_env()
+    oldest = time.time() - max_age_hours * 3600
+    stale = set()
+    for sheet_id, title, row_count, h_hash in sheets:
+        saved = stored.get(sheet_id)
+        if saved is None or saved[:3] != (title, row_count, h_hash) or saved[3] < oldest:
+            stale.add(sheet_id)
+    return stale
+
+def changed_tail_sheet_ids(conn, spreadsheet_id, tails):
+    """sheet_id yang kunci di baris terakhir (dan baris sesudahnya) berbeda dengan indeks.
+    tails: {sheet_id: {nomor_baris: {nama_kunci: nilai}}} dibaca langsung dari sheet"""
+    changed = set()
+    for sheet_id, rows in tails.items():
+        if not rows:
+            continue
+        indexed = {row: {} for row in rows}
+        for row, key_name, key_value in conn.execute(
+            "SELECT row_number, key_name, key_value FROM keys "
+            "WHERE spreadsheet_id = ? AND sheet_id = ? AND row_number BETWEEN ? AND ?",
+            (spreadsheet_id, sheet_id, min(rows), max(rows)),
+        ):
+            indexed[row][key_name] = key_value
+        if indexed != rows:
+            changed.add(sheet_id)
+    return changed
+
+def forget_missing_sheets(conn, spreadsheet_id, sheet_ids):
+    """Hapus entri sheet yang sudah tidak ada / tidak dipakai lagi"""
+    placeholders = ",".join("?" * len(sheet_ids)) or "NULL"
+    params = [spreadsheet_id, *sheet_ids]
+    conn.execute(f"DELETE FROM keys WHERE spreadsheet_id = ? AND sheet_id NOT IN ({placeholders})", params)
+    conn.execute(f"DELETE FROM sheets WHERE spreadsheet_id = ? AND sheet_id NOT IN ({placeholders})", params)
+    conn.commit()
+
+def invalidate_sheet(conn, spreadsheet_id, sheet_id):
+    """Buang indeks satu sheet supaya di-scan ulang"""
+    conn.execute("DELETE FROM keys WHERE spreadsheet_id = ? AND sheet_id = ?", (spreadsheet_id, sheet_id))
+    conn.execute("DELETE FROM sheets WHERE spreadsheet_id = ? AND sheet_id = ?", (spreadsheet_id, sheet_id))
+    conn.commit()
+
+def begin_sheet(conn, spreadsheet_id, sheet_id):
+    """Mulai scan ulang satu sheet (kunci lama dibuang)"""
+    conn.execute("DELETE FROM keys WHERE spreadsheet_id = ? AND sheet_id = ?", (spreadsheet_id, sheet_id))
+
+def add_keys(conn, spreadsheet_id, sheet_id, entries):
+    """Tambah kunci hasil scan. entries: iterable (key_name, key_value, row_number)"""
+    conn.executemany(
+        "INSERT INTO keys (spreadsheet_id, sheet_id, key_name, key_value, row_number) VALUES (?, ?, ?, ?, ?)",
+        ((spreadsheet_id, sheet_id, key_name, key_value, row) for key_name, key_value, row in entries),
+    )
+
+def finish_sheet(conn, spreadsheet_id, sheet_id, title, row_count, h_hash, data_rows):
+    """Tandai scan satu sheet selesai"""
+    conn.execute(
+        "INSERT OR REPLACE INTO sheets VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (spreadsheet_id, sheet_id, title, row_count, h_hash, data_rows, time.time()),
+    )
+    conn.commit()
+
+def sheet_data_rows(conn, spreadsheet_id):
+    """{sheet_id: jumlah baris data} menurut indeks"""
+    return dict(conn.execute(
+        "SELECT sheet_id, data_rows FROM sheets WHERE spreadsheet_id = ?", (spreadsheet_id,)
+    ))
+
+def lookup(conn, spreadsheet_id, deletion_keys, key_names):
+    """Cari semua lokasi kunci penghapusan.
+    Hasil: list (sheet_id, row_number, key_name, key_value, key_id) urut per sheet lalu baris"""
+    conn.execute("DROP TABLE IF EXISTS temp.deletion_keys")
+    conn.execute("CREATE TEMP TABLE deletion_keys (key_id INTEGER, key_name TEXT, key_value TEXT)")
+    conn.executemany(
+        "INSERT INTO temp.deletion_keys VALUES (?, ?, ?)",
+        (
+            (key_id, key_name, key_value)
+            for key_id, key in enumerate(deletion_keys)
+            for key_name, key_value in zip(key_names, key) if key_value
+        ),
+    )
+    rows = conn.execute(
+        """
+        SELECT k.sheet_id, k.row_number, k.key_name, k.key_value, d.key_id
+        FROM temp.deletion_keys d
+        JOIN keys k ON k.spreadsheet_id = ? AND k.key_name = d.key_name AND k.key_value = d.key_value
+        ORDER BY k.sheet_id, k.row_number, d.key_id
+        """,
+        (spreadsheet_id,),
+    ).fetchall()
+    conn.execute("DROP TABLE temp.deletion_keys")
+    return rows
+
+def apply_row_deletions(conn, spreadsheet_id, sheet_id, ranges, row_count):
+    """Geser indeks setelah baris dihapus. ranges: (awal, akhir) inklusif, urut dari bawah"""
+    removed = 0
+    for start, end in ranges:
+        count = end - start + 1
+        conn.execute(
+            "DELETE FROM keys WHERE spreadsheet_id = ? AND sheet_id = ? AND row_number BETWEEN ? AND ?",
+            (spreadsheet_id, sheet_id, start, end),
+        )
+        conn.execute(
+            "UPDATE keys SET row_number = row_number - ? WHERE spreadsheet_id = ? AND sheet_id = ? AND row_number > ?",
+            (count, spreadsheet_id, sheet_id, end),
+        )
+        removed += count
+    conn.execute(
+        "UPDATE sheets SET row_count = ?, data_rows = MAX(data_rows - ?, 0) WHERE spreadsheet_id = ? AND sheet_id = ?",
+        (row_count, removed, spreadsheet_id, sheet_id),
+    )
+    conn.commit()
@@ -0,0 +1,108 @@
+import os
+import json
+import time
+import threading
+from globals import repo_path
+
+# Jurnal run untuk melanjutkan run yang terputus (crash, kuota habis, atau STOP).
+# Per workflow disimpan satu run terakhir: parameter, langkah yang selesai per sheet
+# dan batch yang sudah ter-commit. Disimpan ulang (atomik) setiap ada kemajuan.
+
+def journal_path_from_env():
+    """Lokasi file jurnal (relatif terhadap folder repo), dibaca saat dipakai"""
+    return repo_path(os.getenv("RUN_JOURNAL_PATH", ".run_journal.json"))
+
+STATUS_RUNNING = "berjalan"
+STATUS_STOPPED = "dihentikan"
+STATUS_FAILED = "gagal"
+STATUS_DONE = "selesai"
+
+_lock = threading.Lock()
+
+def _read(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+class RunJournal:
+    """Jurnal satu run: {workflow, spreadsheet_id, params, status, steps, sheets}"""
+
+    def __init__(self, data, path=None):
+        self.data = data
+        self.path = path or journal_path_from_env()
+
+    @property
+    def params(self):
+        return self.data["params"]
+
+    @property
+    def spreadsheet_id(self):
+        return self.data["spreadsheet_id"]
+
+    def save(self):
+        """Tulis jurnal (workflow lain di file tidak disentuh)"""
+        with _lock:
+            self.data["updated"] = time.time()
+            data = _read(self.path)
+            data[self.data["workflow"]] = self.data
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+
+    def finish(self, status):
+        self.data["status"] = status
+        self.save()
+
+    def step_done(self, step):
+        return step in self.data["steps"]
+
+    def mark_step(self, step):
+        if step not in self.data["steps"]:
+            self.data["steps"].append(step)
+        self.save()
+
+    def sheet(self, sheet_id):
+        """Catatan satu sheet (dict kosong bila belum ada)"""
+        return self.data["sheets"].get(str(sheet_id), {})
+
+    def update_sheet(self, sheet_id, save=True, **fields):
+        self.data["sheets"].setdefault(str(sheet_id), {}).update(fields)
+        if save:
+            self.save()
+
+def start(workflow, spreadsheet_id, params, path=None):
+    """Mulai jurnal baru untuk workflow ini (jurnal lama diganti)"""
+    journal = RunJournal({
+        "workflow": workflow,
+        "spreadsheet_id": spreadsheet_id,
+        "params": params,
+        "status": STATUS_RUNNING,
+        "started": time.time(),
+        "steps": [],
+        "sheets": {},
+    }, path)
+    journal.save()
+    return journal
+
+def has_unfinished(workflow, spreadsheet_id, path=None):
+    """Ada run yang belum selesai untuk spreadsheet ini (jurnal tidak diubah)"""
+    with _lock:
+        data = _read(path or journal_path_from_env()).get(workflow)
+    return bool(data) and data.get("status") != STATUS_DONE and data.get("spreadsheet_id") == spreadsheet_id
+
+def load_unfinished(workflow, spreadsheet_id, path=None):
+    """Jurnal run terakhir yang belum selesai untuk spreadsheet ini, atau None"""
+    path = path or journal_path_from_env()
+    with _lock:
+        data = _read(path).get(workflow)
+    if not data or data.get("status") == STATUS_DONE or data.get("spreadsheet_id") != spreadsheet_id:
+        return None
+    journal = RunJournal(data, path)
+    journal.data["status"] = STATUS_RUNNING
+    journal.save()
+    return journal
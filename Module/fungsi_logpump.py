@@ -0,0 +1,115 @@
+import os
+import time
+import queue
+import tkinter as tk
+from dotenv import load_dotenv
+from globals import repo_path
+
+# Saluran log thread-safe untuk jendela Tk.
+# Thread pekerja hanya memasukkan pesan ke antrean; thread Tk menguras antrean per batch lewat after(),
+# menulis semua baris ke file log dan hanya menyimpan LOG_MAX_LINES baris terakhir di widget.
+
+LOG_BATCH = 5000
+
+def log_settings_from_env():
+    """(folder log relatif terhadap folder repo, LOG_MAX_LINES, LOG_INTERVAL_MS)"""
+    return (
+        repo_path(os.getenv("LOG_DIR", "logs")),
+        int(os.getenv("LOG_MAX_LINES", "2000")),
+        int(os.getenv("LOG_INTERVAL_MS", "100")),
+    )
+
+class LogPump:
+    """Logger untuk thread pekerja; tampilan widget diperbarui di thread Tk"""
+
+    def __init__(self, widget, name, max_lines=None, interval_ms=None):
+        self.widget = widget
+        self.name = name
+        self.fixed_settings = (max_lines, interval_ms)
+        self.log_dir = None
+        self.load_settings()
+        self.queue = queue.SimpleQueue()
+        self.log_file = None
+        self.log_path = None
+        self.widget_lines = 0
+        self.widget.after(self.interval_ms, self._drain)
+
+    def __call__(self, msg):
+        self.queue.put(str(msg))
+
+    def call(self, fn, *args):
+        """Jalankan fn di thread Tk setelah semua pesan sebelumnya tampil"""
+        self.queue.put((fn, args))
+
+    def load_settings(self):
+        """Pengaturan dari environment; yang diberikan ke konstruktor tidak ditimpa"""
+        max_lines, interval_ms = self.fixed_settings
+        self.log_dir, env_max_lines, env_interval_ms = log_settings_from_env()
+        self.max_lines = max_lines or env_max_lines
+        self.interval_ms = interval_ms or env_interval_ms
+
+    def start_run(self):
+        """Kosongkan widget dan buka file log baru untuk satu run (dipanggil di thread Tk).
+        .env dimuat dulu supaya LOG_DIR/LOG_MAX_LINES di sana ikut dipakai."""
+        load_dotenv()
+        self.load_settings()
+        self._close_file()
+        self.widget.configure(state="normal")
+        self.widget.delete(1.0, tk.END)
+        self.widget.configure(state="disabled")
+        self.widget_lines = 0
+        try:
+            os.makedirs(self.log_dir, exist_ok=True)
+            self.log_path = os.path.join(self.log_dir, f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}.log")
+            self.log_file = open(self.log_path, "a", encoding="utf-8")
+            self(f"📝 Log lengkap: {self.log_path}")
+        except OSError as e:
+            self.log_path = None
+            self(f"⚠️ Gagal membuka file log: {e}")
+
+    def finish_run(self):
+        """Tutup file log setelah semua pesan run ini ditulis"""
+        self.call(self._close_file)
+
+    def _close_file(self):
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+    def _drain(self):
+        if not self.widget.winfo_exists():
+            self._close_file()
+            return
+        lines = []
+        for _ in range(LOG_BATCH):
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, tuple):
+                self._flush(lines)
+                lines = []
+                fn, args = item
+                fn(*args)
+            else:
+                lines.append(item)
+        self._flush(lines)
+        # Antrean masih panjang: kuras lagi secepatnya
+        self.widget.after(1 if not self.queue.empty() else self.interval_ms, self._drain)
+
+    def _flush(self, lines):
+        if not lines:
+            return
+        if self.log_file is not None:
+            self.log_file.write("\n".join(lines) + "\n")
+            self.log_file.flush()
+        lines = lines[-self.max_lines:]
+        self.widget.configure(state="normal")
+        self.widget.insert(tk.END, "\n".join(lines) + "\n")
+        self.widget_lines += sum(line.count("\n") + 1 for line in lines)
+        excess = self.widget_lines - self.max_lines
+        if excess > 0:
+            self.widget.delete(1.0, f"{excess + 1}.0")
+            self.widget_lines -= excess
+        self.widget.see(tk.END)
+        self.widget.configure(state="disabled")
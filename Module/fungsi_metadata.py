@@ -0,0 +1,113 @@
+import threading
+import gspread
+from Module import fungsi_sheetsclient
+from Module import fungsi_scheduler as scheduler
+
+# Cache metadata spreadsheet bersama untuk semua modul.
+# Metadata diambil sekali per run dengan field mask minimal (judul, properti sheet, named range),
+# lalu diperbarui secara lokal saat sheet di-rename, baris dihapus atau named range diganti.
+# Cache hanya dibuang bila ada request yang gagal.
+
+METADATA_FIELDS = (
+    "properties.title,"
+    "sheets.properties(sheetId,title,index,sheetType,"
+    "gridProperties(rowCount,columnCount,frozenRowCount,frozenColumnCount)),"
+    "namedRanges(namedRangeId,name,range)"
+)
+
+class SpreadsheetMetadata:
+    """Metadata satu spreadsheet: judul, properti sheet (format API v4) dan named range"""
+
+    def __init__(self, spreadsheet_id, data):
+        self.spreadsheet_id = spreadsheet_id
+        self.title = data.get("properties", {}).get("title", "")
+        self.sheets = data.get("sheets", [])
+        # {nama: namedRange (namedRangeId, name, range)}
+        self.named_ranges = {r["name"]: r for r in data.get("namedRanges", [])}
+        self.lock = threading.Lock()
+
+    def sheet(self, title=None, sheet_id=None):
+        """Sheet (dict {"properties": ...}) berdasarkan judul atau sheetId"""
+        for sheet in self.sheets:
+            props = sheet["properties"]
+            if (title is not None and props["title"] == title) or (
+                sheet_id is not None and props["sheetId"] == sheet_id
+            ):
+                return sheet
+        return None
+
+    def sheet_id(self, title):
+        sheet = self.sheet(title=title)
+        return sheet["properties"]["sheetId"] if sheet else None
+
+    def rename_sheet(self, sheet_id, new_title):
+        with self.lock:
+            sheet = self.sheet(sheet_id=sheet_id)
+            if sheet:
+                sheet["properties"]["title"] = new_title
+
+    def set_row_count(self, sheet_id, row_count):
+        with self.lock:
+            sheet = self.sheet(sheet_id=sheet_id)
+            if sheet:
+                sheet["properties"].setdefault("gridProperties", {})["rowCount"] = row_count
+
+    def set_named_range(self, named_range):
+        with self.lock:
+            self.named_ranges[named_range["name"]] = named_range
+
+    def remove_named_range(self, name):
+        with self.lock:
+            self.named_ranges.pop(name, None)
+
+_cache = {}
+_lock = threading.Lock()
+
+def get_metadata(spreadsheet_id, refresh=False, service=None):
+    """Metadata dari cache; diambil (satu request kecil) bila belum ada atau refresh=True"""
+    with _lock:
+        metadata = _cache.get(spreadsheet_id)
+    if metadata is None or refresh:
+        service = service or fungsi_sheetsclient.get_sheets_service()
+        data = scheduler.execute(service.spreadsheets().get(
+            spreadsheetId=spreadsheet_id, fields=METADATA_FIELDS
+        ))
+        metadata = SpreadsheetMetadata(spreadsheet_id, data)
+        with _lock:
+            _cache[spreadsheet_id] = metadata
+    return metadata
+
+def cached_metadata(spreadsheet_id):
+    """Metadata di cache tanpa request (None bila belum ada)"""
+    with _lock:
+        return _cache.get(spreadsheet_id)
+
+def invalidate(spreadsheet_id):
+    """Buang cache (dipanggil saat request ke spreadsheet gagal)"""
+    with _lock:
+        _cache.pop(spreadsheet_id, None)
+
+def record_rename(spreadsheet_id, sheet_id, new_title):
+    metadata = cached_metadata(spreadsheet_id)
+    if metadata:
+        metadata.rename_sheet(sheet_id, new_title)
+
+def record_row_count(spreadsheet_id, sheet_id, row_count):
+    metadata = cached_metadata(spreadsheet_id)
+    if metadata:
+        metadata.set_row_count(sheet_id, row_count)
+
+def open_spreadsheet(gc, metadata):
+    """Objek gspread Spreadsheet dari metadata cache.
+    gc.open_by_key() selalu mengambil metadata lengkap, jadi objeknya disusun langsung."""
+    spreadsheet = gspread.Spreadsheet.__new__(gspread.Spreadsheet)
+    spreadsheet.client = gc.http_client
+    spreadsheet._properties = {"id": metadata.spreadsheet_id, "title": metadata.title}
+    return spreadsheet
+
+def worksheets(spreadsheet, metadata):
+    """Daftar gspread Worksheet dari metadata cache (setara spreadsheet.worksheets())"""
+    return [
+        gspread.Worksheet(spreadsheet, sheet["properties"], spreadsheet.id, spreadsheet.client)
+        for sheet in metadata.sheets
+    ]
@@ -0,0 +1,234 @@
+import os
+import time
+import random
+import threading
+import logging
+from globals import get_stop_requested
+from Module import fungsi_trace
+
+# Penjadwal request Google Sheets API.
+# Semua panggilan API lewat call()/execute() supaya kuota baca/tulis per menit dihormati
+# (token bucket) dan error 429/5xx diulang dengan exponential backoff + jitter.
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Request yang tidak idempoten (mis. deleteDimension per indeks) hanya diulang saat 429:
+# 5xx bisa datang setelah server sudah meng-commit, sehingga pengulangan menghapus baris lain
+RATE_LIMIT_STATUSES = {429}
+STOP_CHECK_INTERVAL = 0.5
+
+class RunStopped(Exception):
+    """STOP ditekan: panggilan API berikutnya tidak dijalankan"""
+
+def check_stop():
+    if get_stop_requested():
+        raise RunStopped("Proses dihentikan oleh pengguna")
+
+def wait(delay):
+    """time.sleep yang tetap memeriksa STOP tiap STOP_CHECK_INTERVAL detik"""
+    deadline = time.monotonic() + delay
+    while True:
+        check_stop()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        time.sleep(min(remaining, STOP_CHECK_INTERVAL))
+
+class TokenBucket:
+    """Token bucket thread-safe: `capacity` token, terisi `per_minute` token per menit"""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Ambil satu token, tunggu bila perlu. Mengembalikan lama menunggu (detik)"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            wait(delay)
+            waited += delay
+
+    def drain(self):
+        """Kosongkan bucket (dipakai saat server membalas 429)"""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0)
+
+def error_status(error):
+    """Kode HTTP dari error googleapiclient (HttpError) atau gspread (APIError)"""
+    resp = getattr(error, "resp", None)
+    if resp is not None and getattr(resp, "status", None):
+        return int(resp.status)
+    response = getattr(error, "response", None)
+    if response is not None and getattr(response, "status_code", None):
+        return int(response.status_code)
+    return None
+
+def retry_after_seconds(error):
+    """Nilai header Retry-After (detik) bila ada"""
+    headers = getattr(error, "resp", None)
+    if headers is None:
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+    if headers is None:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def quota_from_env():
+    """Kuota (baca, tulis) per menit dari environment, dibaca saat dipakai (setelah .env dimuat)"""
+    return (
+        int(os.getenv("QUOTA_READ_PER_MINUTE", "60")),
+        int(os.getenv("QUOTA_WRITE_PER_MINUTE", "60")),
+    )
+
+def retry_policy_from_env():
+    """(jumlah retry maksimum, backoff dasar, backoff maksimum) dari environment, dibaca saat dipakai"""
+    return (
+        int(os.getenv("API_MAX_RETRIES", "5")),
+        float(os.getenv("API_BACKOFF_BASE", "1")),
+        float(os.getenv("API_BACKOFF_MAX", "64")),
+    )
+
+class RequestScheduler:
+    """Menjalankan panggilan API dengan kuota token bucket dan retry backoff"""
+
+    def __init__(self, read_per_minute=None, write_per_minute=None,
+                 max_retries=None, backoff_base=None, backoff_max=None):
+        env_read, env_write = quota_from_env()
+        self.set_quota(read_per_minute or env_read, write_per_minute or env_write)
+        env_retries, env_base, env_max = retry_policy_from_env()
+        self.set_retry_policy(
+            env_retries if max_retries is None else max_retries,
+            env_base if backoff_base is None else backoff_base,
+            env_max if backoff_max is None else backoff_max,
+        )
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def set_quota(self, read_per_minute, write_per_minute):
+        """Pasang kuota baru (bucket diganti hanya bila nilainya berubah)"""
+        quota = (read_per_minute, write_per_minute)
+        if getattr(self, "quota", None) != quota:
+            self.quota = quota
+            self.buckets = {
+                "read": TokenBucket(read_per_minute),
+                "write": TokenBucket(write_per_minute),
+            }
+
+    def set_retry_policy(self, max_retries, backoff_base, backoff_max):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats = {
+                "calls": 0,
+                "retries": 0,
+                "rate_limited": 0,
+                "quota_wait": 0.0,
+                "backoff_wait": 0.0,
+            }
+
+    def _add_stat(self, name, value):
+        with self.stats_lock:
+            self.stats[name] += value
+
+    def backoff_delay(self, attempt, error):
+        """Lama tunggu sebelum percobaan ulang: Retry-After atau backoff eksponensial + jitter"""
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def call(self, fn, *args, kind="read", retries=None, retry_statuses=RETRY_STATUSES, **kwargs):
+        """Jalankan fn(*args, **kwargs) sebagai panggilan API jenis `kind` ("read"/"write").
+        Hanya error dengan status di retry_statuses yang diulang."""
+        bucket = self.buckets[kind]
+        max_retries = self.max_retries if retries is None else retries
+        attempt = 0
+        quota_wait = backoff_wait = 0.0
+        while True:
+            # STOP diperiksa sebelum setiap panggilan (termasuk retry)
+            check_stop()
+            waited = bucket.acquire()
+            quota_wait += waited
+            self._add_stat("quota_wait", waited)
+            self._add_stat("calls", 1)
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                status = error_status(e)
+                if status not in retry_statuses or attempt >= max_retries:
+                    fungsi_trace.record_call(
+                        fn, args, kwargs, kind, time.perf_counter() - started, attempt,
+                        quota_wait, backoff_wait, status or "error",
+                    )
+                    raise
+                if status == 429:
+                    self._add_stat("rate_limited", 1)
+                    bucket.drain()
+                delay = self.backoff_delay(attempt, e)
+                logging.warning(f"⏳ API {status}, ulangi dalam {delay:.1f} detik (percobaan {attempt + 1})")
+                wait(delay)
+                backoff_wait += delay
+                self._add_stat("backoff_wait", delay)
+                self._add_stat("retries", 1)
+                attempt += 1
+                continue
+            fungsi_trace.record_call(
+                fn, args, kwargs, kind, time.perf_counter() - started, attempt,
+                quota_wait, backoff_wait, 200, result,
+            )
+            return result
+
+    def execute(self, request, kind="read", retries=None, retry_statuses=RETRY_STATUSES):
+        """Jalankan request googleapiclient (objek dengan .execute())"""
+        return self.call(request.execute, kind=kind, retries=retries, retry_statuses=retry_statuses)
+
+    def summary(self):
+        """Ringkasan statistik run ini dalam satu baris"""
+        with self.stats_lock:
+            s = dict(self.stats)
+        return (
+            f"📊 API: {s['calls']} panggilan, {s['retries']} retry, {s['rate_limited']}× 429, "
+            f"tunggu kuota {s['quota_wait']:.1f} dtk, tunggu backoff {s['backoff_wait']:.1f} dtk"
+        )
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """Penjadwal bersama untuk seluruh proses (kuota dan retry mengikuti environment saat ini)"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        else:
+            _scheduler.set_quota(*quota_from_env())
+            _scheduler.set_retry_policy(*retry_policy_from_env())
+        return _scheduler
+
+def call(fn, *args, kind="read", retries=None, retry_statuses=RETRY_STATUSES, **kwargs):
+    return get_scheduler().call(fn, *args, kind=kind, retries=retries, retry_statuses=retry_statuses, **kwargs)
+
+def execute(request, kind="read", retries=None, retry_statuses=RETRY_STATUSES):
+    return get_scheduler().execute(request, kind=kind, retries=retries, retry_statuses=retry_statuses)
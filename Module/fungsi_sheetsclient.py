@@ -0,0 +1,109 @@
+import os
+import json
+import threading
+import gspread
+import httplib2
+from requests.adapters import HTTPAdapter
+from google.oauth2.service_account import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build, build_from_document
+from dotenv import load_dotenv
+
+# Klien Google Sheets bersama untuk semua modul.
+# Credentials dibuat sekali per proses (token di-refresh otomatis oleh google-auth),
+# service googleapiclient dibuat sekali per thread karena httplib2 tidak thread-safe.
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+]
+GOOGLE_SHEETS_URL = "https://sheets.googleapis.com/"
+
+_lock = threading.Lock()
+_credentials = None
+_gspread_client = None
+_discovery_document = None
+_generation = 0
+_local = threading.local()
+
+def client_settings_from_env():
+    """(timeout HTTP, alamat pengganti Sheets API) dibaca saat client dibuat, setelah .env dimuat.
+    Alamat pengganti dipakai mis. untuk server tiruan di benchmark/; kosong = Google"""
+    return int(os.getenv("SHEETS_HTTP_TIMEOUT", "120")), os.getenv("SHEETS_API_ENDPOINT", "")
+
+class EndpointAdapter(HTTPAdapter):
+    """Adapter requests yang mengalihkan panggilan gspread ke SHEETS_API_ENDPOINT"""
+
+    def __init__(self, endpoint):
+        super().__init__()
+        self.endpoint = endpoint.rstrip("/") + "/"
+
+    def send(self, request, **kwargs):
+        request.url = self.endpoint + request.url[len(GOOGLE_SHEETS_URL):]
+        return super().send(request, **kwargs)
+
+def use_credentials(credentials):
+    """Pakai credentials tertentu (mis. AnonymousCredentials untuk server tiruan).
+    Client dan service yang sudah dibuat dibuang"""
+    global _credentials, _gspread_client, _generation
+    with _lock:
+        _credentials = credentials
+        _gspread_client = None
+        _generation += 1
+
+def get_credentials():
+    """Credentials service account bersama (dibaca dari GOOGLE_CREDS_PATH sekali saja).
+    .env selalu dimuat dulu supaya pengaturan client lain juga terbaca"""
+    global _credentials
+    load_dotenv()
+    with _lock:
+        if _credentials is None:
+            creds_path = os.getenv("GOOGLE_CREDS_PATH")
+            if not creds_path or not os.path.exists(creds_path):
+                raise FileNotFoundError(
+                    f"File credentials.json tidak ditemukan di path: {creds_path}"
+                )
+            _credentials = Credentials.from_service_account_file(creds_path, scopes=SCOPES)
+        return _credentials
+
+def _load_discovery_document():
+    """Dokumen discovery dari file lokal (SHEETS_DISCOVERY_PATH) jika ada"""
+    global _discovery_document
+    discovery_path = os.getenv("SHEETS_DISCOVERY_PATH")
+    if _discovery_document is None and discovery_path and os.path.exists(discovery_path):
+        with open(discovery_path, encoding="utf-8") as f:
+            _discovery_document = json.load(f)
+    return _discovery_document
+
+def get_sheets_service():
+    """Service Sheets API v4 per thread, memakai satu koneksi HTTP yang dipakai ulang"""
+    service = getattr(_local, "service", None)
+    if service is None or getattr(_local, "generation", None) != _generation:
+        credentials = get_credentials()
+        timeout, endpoint = client_settings_from_env()
+        http = AuthorizedHttp(credentials, http=httplib2.Http(timeout=timeout))
+        client_options = {"api_endpoint": endpoint} if endpoint else None
+        document = _load_discovery_document()
+        if document:
+            service = build_from_document(document, http=http, client_options=client_options)
+        else:
+            # static_discovery memakai dokumen bawaan googleapiclient, tanpa request jaringan
+            service = build(
+                "sheets", "v4", http=http, static_discovery=True, cache_discovery=False,
+                client_options=client_options,
+            )
+        _local.service = service
+        _local.generation = _generation
+    return service
+
+def get_gspread_client():
+    """Client gspread bersama (satu session HTTP dengan connection pool)"""
+    global _gspread_client
+    credentials = get_credentials()
+    with _lock:
+        if _gspread_client is None:
+            _gspread_client = gspread.authorize(credentials)
+            _, endpoint = client_settings_from_env()
+            if endpoint:
+                _gspread_client.http_client.session.mount(GOOGLE_SHEETS_URL, EndpointAdapter(endpoint))
+        return _gspread_client
@@ -0,0 +1,71 @@
+import os
+import json
+import hashlib
+import threading
+from globals import repo_path
+
+# Penyimpanan state lokal untuk mode incremental Tampilan Sheet.
+# Per spreadsheet disimpan fingerprint tiap sheet setelah berhasil diproses:
+# sheetId, judul, jumlah baris, hash header dan hash baris data terakhir.
+
+def state_path_from_env():
+    """Lokasi file state (relatif terhadap folder repo), dibaca saat dipakai"""
+    return repo_path(os.getenv("TAMPILAN_STATE_PATH", ".tampilan_state.json"))
+
+# Kolom yang ditulis ulang oleh Tampilan Sheet (A, B, AA) tidak ikut di-hash
+GENERATED_COLUMNS = {0, 1, 26}
+
+_lock = threading.Lock()
+
+def hash_values(values):
+    """Hash pendek dari daftar nilai sel"""
+    return hashlib.sha1(json.dumps(values, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def sheet_fingerprint(sheet_id, title, row_count, header_values, last_row_values):
+    """Fingerprint satu sheet"""
+    data_values = [
+        val for i, val in enumerate(last_row_values) if i not in GENERATED_COLUMNS
+    ]
+    return {
+        "sheet_id": sheet_id,
+        "title": title,
+        "row_count": row_count,
+        "header_hash": hash_values(header_values),
+        "last_row_hash": hash_values(data_values),
+    }
+
+def load_state(spreadsheet_id, path=None):
+    """Fingerprint tersimpan untuk spreadsheet ini -> {sheet_id (str): fingerprint}"""
+    path = path or state_path_from_env()
+    with _lock:
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f).get(spreadsheet_id, {})
+        except (OSError, ValueError):
+            return {}
+
+def save_state(spreadsheet_id, sheets_state, path=None, sheet_ids=None):
+    """Gabungkan fingerprint baru ke state spreadsheet ini: sheet yang tidak ikut run ini tetap
+    disimpan, spreadsheet lain di file tidak disentuh. sheet_ids (opsional): semua sheetId yang
+    masih ada, fingerprint sheet lain dibuang."""
+    path = path or state_path_from_env()
+    with _lock:
+        data = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+        merged = data.get(spreadsheet_id, {})
+        merged.update(sheets_state)
+        if sheet_ids is not None:
+            keep = {str(sheet_id) for sheet_id in sheet_ids}
+            merged = {key: value for key, value in merged.items() if key in keep}
+        data[spreadsheet_id] = merged
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
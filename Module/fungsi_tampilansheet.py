@@ -1,54 +1,160 @@
 import gspread
-from google.oauth2.service_account import Credentials
-import time
 from dotenv import load_dotenv
 import os
-from googleapiclient.discovery import build
 from gspread.utils import a1_range_to_grid_range, rowcol_to_a1
 import re
 import logging
+from concurrent.futures import ThreadPoolExecutor, CancelledError
 from globals import get_stop_requested, set_stop_requested
+from Module import fungsi_sheetsclient
+from Module import fungsi_scheduler as scheduler
+from Module import fungsi_statesheet
+from Module import fungsi_metadata
+from Module import fungsi_trace
+from Module import fungsi_journal
 
 
 # Load environment variables
 load_dotenv(dotenv_path="C:/Users/praaayogi/Documents/GitHub/Automation-Katalog-Spreadsheet-Python-Desktop/.env")
 
 def setup_google_sheets():
-    """Setup Google Sheets dengan credentials yang diperbaharui"""
-    load_dotenv()
-    creds_path = os.getenv("GOOGLE_CREDS_PATH")
-    if not creds_path or not os.path.exists(creds_path):
-        raise FileNotFoundError(
-            f"File credentials.json tidak ditemukan di path: {creds_path}"
+    """Client gspread bersama (credentials dan koneksi dipakai ulang)"""
+    return fungsi_sheetsclient.get_gspread_client()
+
+def get_sheets_service():
+    """Service Google Sheets API bersama untuk thread ini"""
+    return fungsi_sheetsclient.get_sheets_service()
+
+def quote_sheet_title(title):
+    """Nama sheet dalam format A1 (diberi kutip)"""
+    return "'" + title.replace("'", "''") + "'"
+
+class SheetSnapshot:
+    """Data satu sheet yang dibaca sekali lalu dipakai semua langkah proses"""
+
+    def __init__(self, sheet, col_lengths, header_values):
+        self.sheet = sheet
+        self.sheet_id = sheet.id
+        self.title = sheet.title
+        self.row_count = sheet.row_count
+        self.col_lengths = col_lengths
+        self.header_values = header_values
+        self.last_row_values = []
+        self.existing_values = None
+        self.processed = False
+
+    @property
+    def last_data_row(self):
+        """Baris terakhir berisi data di kolom C (acuan semua langkah)"""
+        return self.col_lengths.get(3, 0)
+
+    @property
+    def has_data_rows(self):
+        """Ada data di bawah header (baris 10 ke bawah)"""
+        return self.last_data_row > SNAPSHOT_HEADER_ROW
+
+    @property
+    def trimmed_row_count(self):
+        """Jumlah baris grid setelah baris kosong di bawah tabel dipangkas"""
+        if not self.has_data_rows:
+            return self.row_count
+        return min(self.row_count, self.last_data_row)
+
+    def col_length(self, col_index):
+        """Panjang kolom tertentu (setara len(sheet.col_values(col_index)))"""
+        if col_index not in self.col_lengths:
+            self.col_lengths[col_index] = len(scheduler.call(self.sheet.col_values, col_index))
+        return self.col_lengths[col_index]
+
+    def fingerprint(self):
+        """Fingerprint sheet untuk mode incremental"""
+        return fungsi_statesheet.sheet_fingerprint(
+            self.sheet_id, self.title, self.row_count, self.header_values, self.last_row_values
         )
 
-    # Gunakan google.oauth2.service_account.Credentials (sudah modern)
-    creds = Credentials.from_service_account_file(
-        creds_path,
-        scopes=[
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive",
-        ],
-    )
-    
-    # Pastikan menggunakan gspread terbaru
-    gc = gspread.authorize(creds)
-    return gc
+SNAPSHOT_COLUMNS = {3: "C", 10: "J"}  # C: acuan data, J: named range
+SNAPSHOT_HEADER_ROW = 9
+SNAPSHOT_MAX_SHEETS_PER_CALL = 60
 
-def get_sheets_service():
-    """Get Google Sheets API service dengan credentials modern"""
-    creds_path = os.getenv("GOOGLE_CREDS_PATH")
-    creds = Credentials.from_service_account_file(
-        creds_path,
-        scopes=["https://www.googleapis.com/auth/spreadsheets"],
-    )
-    return build("sheets", "v4", credentials=creds)
+def load_sheet_snapshots(spreadsheet, worksheets):
+    """Baca snapshot semua sheet lewat values_batch_get -> {sheet_id: SheetSnapshot}"""
+    snapshots = {}
+    for chunk_start in range(0, len(worksheets), SNAPSHOT_MAX_SHEETS_PER_CALL):
+        chunk = worksheets[chunk_start:chunk_start + SNAPSHOT_MAX_SHEETS_PER_CALL]
+        ranges = []
+        for ws in chunk:
+            name = quote_sheet_title(ws.title)
+            ranges += [f"{name}!{letter}:{letter}" for letter in SNAPSHOT_COLUMNS.values()]
+            ranges.append(f"{name}!{SNAPSHOT_HEADER_ROW}:{SNAPSHOT_HEADER_ROW}")
+
+        result = scheduler.call(
+            spreadsheet.values_batch_get, ranges, params={"majorDimension": "COLUMNS"}
+        )
+        value_ranges = iter(result.get("valueRanges", []))
+        for ws in chunk:
+            col_lengths = {}
+            for col_index in SNAPSHOT_COLUMNS:
+                values = next(value_ranges, {}).get("values", [])
+                col_lengths[col_index] = len(values[0]) if values else 0
+            header_columns = next(value_ranges, {}).get("values", [])
+            header_values = [col[0] if col else "" for col in header_columns]
+            snapshots[ws.id] = SheetSnapshot(ws, col_lengths, header_values)
+    return snapshots
+
+def load_last_rows(spreadsheet, snapshots):
+    """Isi last_row_values (A:AB baris data terakhir) semua snapshot lewat values_batch_get"""
+    snapshots = [snap for snap in snapshots if snap.last_data_row > 0]
+    for chunk_start in range(0, len(snapshots), SNAPSHOT_MAX_SHEETS_PER_CALL):
+        chunk = snapshots[chunk_start:chunk_start + SNAPSHOT_MAX_SHEETS_PER_CALL]
+        ranges = [
+            f"{quote_sheet_title(snap.title)}!A{snap.last_data_row}:AB{snap.last_data_row}"
+            for snap in chunk
+        ]
+        result = scheduler.call(spreadsheet.values_batch_get, ranges)
+        for snap, value_range in zip(chunk, result.get("valueRanges", [])):
+            values = value_range.get("values", [])
+            snap.last_row_values = values[0] if values else []
+
+def load_existing_values(spreadsheet, snapshots, start_row=10):
+    """Isi existing_values (rumus kolom A, B, AA dan G2:J5) untuk mode diff"""
+    for chunk_start in range(0, len(snapshots), SNAPSHOT_MAX_SHEETS_PER_CALL):
+        chunk = snapshots[chunk_start:chunk_start + SNAPSHOT_MAX_SHEETS_PER_CALL]
+        ranges = []
+        for snap in chunk:
+            name = quote_sheet_title(snap.title)
+            last_row = max(snap.last_data_row, start_row)
+            ranges += [f"{name}!A{start_row}:B{last_row}", f"{name}!AA{start_row}:AA{last_row}",
+                       f"{name}!{SUMMARY_RANGE}"]
+        result = scheduler.call(
+            spreadsheet.values_batch_get, ranges, params={"valueRenderOption": "FORMULA"}
+        )
+        value_ranges = iter(result.get("valueRanges", []))
+        for snap in chunk:
+            ab_rows = next(value_ranges, {}).get("values", [])
+            aa_rows = next(value_ranges, {}).get("values", [])
+            summary_rows = next(value_ranges, {}).get("values", [])
+            summary = {}
+            for r, row in enumerate(summary_rows):
+                for c, val in enumerate(row):
+                    summary[gspread.utils.rowcol_to_a1(2 + r, 7 + c)] = val
+            snap.existing_values = {
+                "A": [row[0] if len(row) > 0 else "" for row in ab_rows],
+                "B": [row[1] if len(row) > 1 else "" for row in ab_rows],
+                "AA": [row[0] if row else "" for row in aa_rows],
+                "summary": summary,
+            }
+
+def load_sheet_snapshot(sheet):
+    """Snapshot untuk satu sheet saja"""
+    return load_sheet_snapshots(sheet.spreadsheet, [sheet])[sheet.id]
 
 def autofill_column_general(
-    sheet, col_letter, start_row, value_or_formula, mode="static", start_number=1
+    sheet, col_letter, start_row, value_or_formula, mode="static", start_number=1,
+    snapshot=None,
 ):
     """Autofill kolom dengan berbagai mode"""
-    total_rows = len(sheet.col_values(3))  # Kolom C sebagai acuan
+    snapshot = snapshot or load_sheet_snapshot(sheet)
+    total_rows = snapshot.last_data_row  # Kolom C sebagai acuan
     last_row = max(total_rows, start_row)
     num_rows = last_row - start_row + 1
     autofill_range = f"{col_letter}{start_row}:{col_letter}{last_row}"
@@ -63,67 +169,72 @@ def autofill_column_general(
         values = [[value_or_formula]] * num_rows
     
     try:
-        sheet.update(
+        scheduler.call(
+            sheet.update,
             range_name=autofill_range, 
             values=values, 
-            value_input_option="USER_ENTERED"
+            value_input_option="USER_ENTERED",
+            kind="write",
         )
         logging.info(f"✅ Kolom {col_letter} berhasil diisi ({num_rows} baris)")
     except Exception as e:
         error_msg = f"⚠️ Gagal mengisi kolom {col_letter}: {e}"
         print(error_msg)
         logging.error(error_msg)
-    
-    time.sleep(min(2, num_rows * 0.02))  # Rate limiting
 
-def add_formulas(sheet, retries=3):
+
+def summary_formulas(max_rows):
+    """Daftar (sel, rumus) rekap di G2:J5"""
+    return [
+        ("G2", f"=COUNTA(C10:C{max_rows})"),
+        ("G3", f"=SUM(Y10:Y{max_rows})"),
+        ("G4", f"=AVERAGE(Y10:Y{max_rows})"),
+        ("J2", f"=COUNTA(Z10:Z{max_rows})"),
+        ("J3", f"=SUM(Z10:Z{max_rows})"),
+        ("J4", f"=SUM(AA10:AA{max_rows})"),
+        ("J5", f'=AVERAGEIF(Z10:Z{max_rows}, ">0", AA10:AA{max_rows})'),
+    ]
+
+def add_formulas(sheet, retries=3, snapshot=None):
     """Tambahkan rumus rekap dengan retry mechanism"""
-    max_rows = len(sheet.col_values(3))
+    snapshot = snapshot or load_sheet_snapshot(sheet)
+    max_rows = snapshot.last_data_row
     max_rows = max(max_rows, 10)
     
     formula_data = [
-        {"range": f"{sheet.title}!G2", "values": [[f"=COUNTA(C10:C{max_rows})"]]},
-        {"range": f"{sheet.title}!G3", "values": [[f"=SUM(Y10:Y{max_rows})"]]},
-        {"range": f"{sheet.title}!G4", "values": [[f"=AVERAGE(Y10:Y{max_rows})"]]},
-        {"range": f"{sheet.title}!J2", "values": [[f"=COUNTA(Z10:Z{max_rows})"]]},
-        {"range": f"{sheet.title}!J3", "values": [[f"=SUM(Z10:Z{max_rows})"]]},
-        {"range": f"{sheet.title}!J4", "values": [[f"=SUM(AA10:AA{max_rows})"]]},
-        {"range": f"{sheet.title}!J5", "values": [[f'=AVERAGEIF(Z10:Z{max_rows}, ">0", AA10:AA{max_rows})']]},
+        {"range": f"{sheet.title}!{cell}", "values": [[formula]]}
+        for cell, formula in summary_formulas(max_rows)
     ]
     
-    for attempt in range(retries):
-        try:
-            sheet.spreadsheet.values_batch_update({
-                "valueInputOption": "USER_ENTERED",
-                "data": formula_data
-            })
-            logging.info("✅ Rumus rekap berhasil ditambahkan")
-            break
-        except Exception as e:
-            error_msg = f"⚠️ Gagal menambahkan rumus rekap (Attempt {attempt + 1}): {e}"
-            print(error_msg)
-            logging.warning(error_msg)
-            if attempt < retries - 1:
-                time.sleep(5)
-    else:
-        logging.error("❌ Gagal menambahkan rumus rekap setelah beberapa percobaan")
+    try:
+        scheduler.call(sheet.spreadsheet.values_batch_update, {
+            "valueInputOption": "USER_ENTERED",
+            "data": formula_data
+        }, kind="write", retries=retries)
+        logging.info("✅ Rumus rekap berhasil ditambahkan")
+    except Exception as e:
+        error_msg = f"❌ Gagal menambahkan rumus rekap: {e}"
+        print(error_msg)
+        logging.error(error_msg)
 
-def clear_rows_after_table(sheet, data_col="C", start_row=10, logger=print):
+def clear_rows_after_table(sheet, data_col="C", start_row=10, logger=print, snapshot=None):
     """Hapus baris kosong setelah data terakhir di tabel"""
     try:
+        snapshot = snapshot or load_sheet_snapshot(sheet)
+
         # Cari baris terakhir yang ada data
-        col_values = sheet.col_values(ord(data_col.upper()) - 64)  # Convert C->3
-        last_data_row = len(col_values)
+        last_data_row = snapshot.col_length(ord(data_col.upper()) - 64)  # Convert C->3
         
         # Cek total baris di sheet
-        sheet_rows = sheet.row_count
+        sheet_rows = snapshot.row_count
         
         if last_data_row < sheet_rows:
             # Ada baris kosong yang perlu dihapus
             rows_to_delete = sheet_rows - last_data_row
             
             # Hapus baris kosong (dari baris terakhir data + 1)
-            sheet.delete_rows(last_data_row + 1, sheet_rows)
+            scheduler.call(sheet.delete_rows, last_data_row + 1, sheet_rows, kind="write")
+            snapshot.row_count = last_data_row
             
             msg = f"🗑️ Dihapus {rows_to_delete} baris kosong setelah baris {last_data_row}"
             logger(msg)
@@ -136,10 +247,11 @@ def clear_rows_after_table(sheet, data_col="C", start_row=10, logger=print):
         logger(error_msg)
         logging.error(error_msg)
 
-def ensure_filter_and_freeze(sheet, logger=print):
+def ensure_filter_and_freeze(sheet, logger=print, snapshot=None):
     """Setup filter dan freeze panes"""
     try:
-        header_values = sheet.row_values(9)
+        snapshot = snapshot or load_sheet_snapshot(sheet)
+        header_values = snapshot.header_values
         last_col_index = len(header_values)
         if last_col_index == 0:
             logger("⚠️ Tidak ada header di baris 9. Filter dilewati.")
@@ -148,10 +260,10 @@ def ensure_filter_and_freeze(sheet, logger=print):
         last_col_letter = gspread.utils.rowcol_to_a1(1, last_col_index).rstrip("1")
         filter_range = f"A9:{last_col_letter}9"
         
-        sheet.set_basic_filter(filter_range)
+        scheduler.call(sheet.set_basic_filter, filter_range, kind="write")
         logger(f"🔍 Filter: {filter_range}")
         
-        sheet.freeze(rows=9, cols=10)
+        scheduler.call(sheet.freeze, rows=9, cols=10, kind="write")
         logger(f"❄️ Freeze: Baris 9, Kolom J")
         
         logging.info(f"✅ Filter dan freeze berhasil diatur: {filter_range}")
@@ -162,222 +274,773 @@ def ensure_filter_and_freeze(sheet, logger=print):
         logging.error(error_msg)
 
 def rename_sheets_from_index(spreadsheet, sheet_order_start, zero_pad=3):
-    """Rename semua sheet mulai dari urutan tertentu"""
+    """Rename semua sheet mulai dari urutan tertentu (satu batchUpdate)"""
     sheet_index_start = sheet_order_start - 1
-    sheets = spreadsheet.worksheets()[sheet_index_start:]
-    
-    for i, sheet in enumerate(sheets, start=sheet_order_start):
+    metadata = fungsi_metadata.get_metadata(spreadsheet.id)
+    titles = {s["properties"]["sheetId"]: s["properties"]["title"] for s in metadata.sheets}
+    renames = {}
+    for i, sheet in enumerate(metadata.sheets[sheet_index_start:], start=sheet_order_start):
         sheet_number = f"{i:0{zero_pad}}"
-        rename_sheet_with_number(spreadsheet, sheet, sheet_number)
+        renames[sheet["properties"]["sheetId"]] = numbered_title(sheet["properties"]["title"], sheet_number)
+    return renumber_sheets(spreadsheet, titles, renames, logger=logging.info)
 
-def rename_sheet_with_number(spreadsheet, sheet, sheet_number):
-    """Rename sheet individual dengan numbering"""
-    old_title = sheet.title
+def numbered_title(old_title, sheet_number):
+    """Judul sheet baru dengan nomor urut di depan"""
     parts = old_title.split(".", 1)
     base_title = (
         parts[1].strip() if len(parts) > 1 and parts[0].isdigit() else old_title
     )
     base_title = base_title.replace(".", "")
-    new_title = f"{sheet_number}.{base_title}"
+    return f"{sheet_number}.{base_title}"
+
+RENAME_TEMP_PREFIX = "~renumber~"
+
+def plan_renumbering(titles, renames):
+    """Rencana rename semua sheet sekaligus.
+    titles: {sheet_id: judul sekarang} untuk SEMUA sheet, renames: {sheet_id: judul baru}.
+    Sheet yang judul lamanya menjadi target sheet lain dipindah dulu ke nama sementara,
+    jadi penggeseran nomor ("003.X" → "002.X" selagi "002.X" masih ada) tidak bentrok.
+    Hasil: (requests urut, {sheet_id: judul akhir}, konflik [(sheet_id, judul_baru)])"""
+    accepted = {sheet_id: title for sheet_id, title in renames.items() if title != titles[sheet_id]}
+    conflicts = []
+    # Target yang dipakai sheet yang tidak di-rename (atau sudah diklaim sheet lain) tidak bisa dipakai
+    while True:
+        taken = {title for sheet_id, title in titles.items() if sheet_id not in accepted}
+        dropped = None
+        for sheet_id, new_title in accepted.items():
+            if new_title in taken:
+                dropped = sheet_id
+                break
+            taken.add(new_title)
+        if dropped is None:
+            break
+        conflicts.append((dropped, accepted.pop(dropped)))
+
+    targets = set(accepted.values())
+    blockers = [sheet_id for sheet_id in accepted if titles[sheet_id] in targets]
+    requests = [
+        build_rename_request(sheet_id, f"{RENAME_TEMP_PREFIX}{sheet_id}") for sheet_id in blockers
+    ]
+    requests += [
+        build_rename_request(sheet_id, new_title)
+        for sheet_id, new_title in accepted.items() if sheet_id not in blockers
+    ]
+    requests += [build_rename_request(sheet_id, accepted[sheet_id]) for sheet_id in blockers]
+
+    final_titles = dict(titles)
+    final_titles.update(accepted)
+    return requests, final_titles, conflicts
+
+def renumber_sheets(spreadsheet, titles, renames, logger=print, dry_run=False):
+    """Jalankan rencana rename dalam satu batchUpdate (request diproses berurutan oleh API,
+    jadi fase nama sementara dan fase nama akhir terkirim bersama).
+    Hasil: {sheet_id: judul setelah proses}"""
+    requests, final_titles, conflicts = plan_renumbering(titles, renames)
+    for sheet_id, new_title in conflicts:
+        error_msg = f"⚠️ Gagal mengganti nama sheet '{titles[sheet_id]}': '{new_title}' sudah ada"
+        logger(error_msg)
+        logging.error(error_msg)
+    if not requests or dry_run:
+        return final_titles
+
+    try:
+        scheduler.call(spreadsheet.batch_update, {"requests": requests}, kind="write")
+    except scheduler.RunStopped:
+        raise
+    except Exception as e:
+        fungsi_metadata.invalidate(spreadsheet.id)
+        error_msg = f"⚠️ Gagal mengganti nama sheet: {e}"
+        logger(error_msg)
+        logging.error(error_msg)
+        return dict(titles)
+
+    renamed = 0
+    for sheet_id, new_title in final_titles.items():
+        if new_title != titles[sheet_id]:
+            fungsi_metadata.record_rename(spreadsheet.id, sheet_id, new_title)
+            msg = f"🔤 Rename: '{titles[sheet_id]}' → '{new_title}'"
+            logger(msg)
+            logging.info(msg)
+            renamed += 1
+    logger(f"📨 {renamed} sheet di-rename dengan 1 batchUpdate ({len(requests)} request)")
+    return final_titles
+
+def rename_sheet_with_number(spreadsheet, sheet, sheet_number):
+    """Rename sheet individual dengan numbering"""
+    old_title = sheet.title
+    new_title = numbered_title(old_title, sheet_number)
     
     if new_title != old_title:
-        try:
-            sheet.update_title(new_title)
-            msg = f"🔤 Rename: '{old_title}' → '{new_title}'"
-            
-            logging.info(msg)
-            sheet = spreadsheet.worksheet(new_title)
-        except Exception as e:
-            error_msg = f"⚠️ Gagal mengganti nama sheet '{old_title}': {e}"
-            print(error_msg)
-            logging.error(error_msg)
+        metadata = fungsi_metadata.get_metadata(spreadsheet.id)
+        titles = {s["properties"]["sheetId"]: s["properties"]["title"] for s in metadata.sheets}
+        titles[sheet.id] = old_title
+        new_title = renumber_sheets(spreadsheet, titles, {sheet.id: new_title}, logger=logging.info)[sheet.id]
+        # Samakan objek Worksheet dengan judul baru (seperti yang dilakukan update_title)
+        sheet._properties["title"] = new_title
     
     return sheet, new_title
 
 def create_named_range_from_sheet_name(
-    spreadsheet_id, sheet, header_row=9, col_start="A", col_end="Z"
+    spreadsheet_id, sheet, header_row=9, col_start="A", col_end="Z", snapshot=None
 ):
     """Membuat named range dari nama sheet"""
     sheet_name = sheet.title
-    clean_name = re.sub(r"[^a-zA-Z]", "", sheet_name)
+    clean_name = clean_range_name(sheet_name)
     if not clean_name:
         logging.warning(f"⚠️ Nama sheet '{sheet_name}' kosong setelah dibersihkan. Skip.")
         return
 
     try:
-        service = get_sheets_service()
-        spreadsheet = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-        
-        sheet_id = next(
-            (s["properties"]["sheetId"] for s in spreadsheet["sheets"] 
-             if s["properties"]["title"] == sheet_name), None
-        )
-        
-        if sheet_id is None:
-            logging.error(f"⚠️ Sheet ID untuk '{sheet_name}' tidak ditemukan.")
-            return
-
         # Get actual data range
-        gc = setup_google_sheets()
-        sh = gc.open_by_key(spreadsheet_id)
-        ws = sh.worksheet(sheet_name)
+        if snapshot is None:
+            snapshot = load_sheet_snapshot(sheet)
         
         col_index = ord(col_start.upper()) - 64
-        col_values = ws.col_values(col_index)
-        last_row = len(col_values)
+        last_row = snapshot.col_length(col_index)
         
         if last_row < header_row:
             logging.warning(f"⚠️ Sheet '{sheet_name}' tidak punya data setelah baris header.")
             return
 
-        # Create range
-        a1_notation_only = f"{col_start}{header_row}:{col_end}{last_row}"
-        range_a1 = f"'{sheet_name}'!{a1_notation_only}"
-        grid_range = a1_range_to_grid_range(a1_notation_only, sheet_id)
-
-        # Delete existing range if exists
-        existing_ranges = spreadsheet.get("namedRanges", [])
-        existing_id = next(
-            (r["namedRangeId"] for r in existing_ranges if r["name"] == clean_name), None
+        desired = {
+            clean_name: named_range_grid(sheet.id, last_row, header_row, col_start, col_end)
+        }
+        sync_named_ranges(
+            spreadsheet_id, desired, {sheet.id}, logger=logging.info,
+            header_row=header_row, col_start=col_start, col_end=col_end,
         )
-
-        requests = []
-        if existing_id:
-            requests.append({"deleteNamedRange": {"namedRangeId": existing_id}})
+        logging.info(f"🏷️ Named range '{clean_name}' Range → '{sheet_name}'!{col_start}{header_row}:{col_end}{last_row}")
         
+    except Exception as e:
+        fungsi_metadata.invalidate(spreadsheet_id)
+        error_msg = f"⚠️ Gagal membuat named range untuk '{sheet_name}': {e}"
+        print(error_msg)
+        logging.error(error_msg)
+
+def build_format_requests(sheet_id, max_rows):
+    """Susun request border, alignment dan format mata uang satu sheet"""
+    def range_obj(start_row, end_row, start_col, end_col):
+        return {
+            "sheetId": sheet_id,
+            "startRowIndex": start_row,
+            "endRowIndex": end_row,
+            "startColumnIndex": start_col,
+            "endColumnIndex": end_col,
+        }
+
+    def full_border(range_obj):
+        border_style = {
+            "style": "SOLID",
+            "color": {"red": 0, "green": 0, "blue": 0},
+        }
+        return {
+            "updateBorders": {
+                "range": range_obj,
+                "top": border_style,
+                "bottom": border_style,
+                "left": border_style,
+                "right": border_style,
+                "innerHorizontal": border_style,
+                "innerVertical": border_style,
+            }
+        }
+
+    requests = []
+
+    # Add borders
+    requests.append(full_border(range_obj(0, 5, 5, 7)))  # F1:G4
+    requests.append(full_border(range_obj(0, 5, 8, 10)))  # I1:J5
+    requests.append(full_border(range_obj(8, max_rows, 0, 28)))  # A9:AB{maxRows}
+
+    # Format alignment & font
+    alignment_zones = [
+        (range_obj(0, 5, 5, 10), "CENTER", "MIDDLE", False),  # F1:J5
+        (range_obj(9, max_rows, 0, 2), "CENTER", "MIDDLE", False),  # A10:B
+        (range_obj(9, max_rows, 2, 5), "LEFT", "MIDDLE", False),  # C10:E
+        (range_obj(9, max_rows, 5, 7), "CENTER", "MIDDLE", False),  # F10:G
+        (range_obj(9, max_rows, 7, 9), "LEFT", "MIDDLE", False),  # H10:I
+        (range_obj(9, max_rows, 9, 10), "CENTER", "MIDDLE", False),  # J10
+        (range_obj(9, max_rows, 10, 24), "LEFT", "MIDDLE", False),  # K10:X
+        (range_obj(9, max_rows, 24, 28), "CENTER", "MIDDLE", False),  # Y10:AB
+    ]
+
+    for rng, h_align, v_align, bold in alignment_zones:
         requests.append({
-            "addNamedRange": {
-                "namedRange": {
-                    "name": clean_name,
-                    "range": grid_range
-                }
+            "repeatCell": {
+                "range": rng,
+                "cell": {
+                    "userEnteredFormat": {
+                        "horizontalAlignment": h_align,
+                        "verticalAlignment": v_align,
+                        "textFormat": {"bold": bold},
+                    }
+                },
+                "fields": "userEnteredFormat(horizontalAlignment,verticalAlignment,textFormat)",
+            }
+        })
+
+    # Format currency
+    currency_ranges = [
+        range_obj(3, 4, 6, 7),  # G4
+        range_obj(2, 4, 6, 7),  # G3:G4
+        range_obj(3, 4, 9, 10),  # J4
+    ]
+    
+    for cr in currency_ranges:
+        requests.append({
+            "repeatCell": {
+                "range": cr,
+                "cell": {
+                    "userEnteredFormat": {
+                        "numberFormat": {
+                            "type": "CURRENCY",
+                            "pattern": "[$Rp-421] #,##0",
+                        }
+                    }
+                },
+                "fields": "userEnteredFormat.numberFormat",
             }
         })
 
-        service.spreadsheets().batchUpdate(
+    return requests
+
+# Mode template: format (border, alignment, format angka) disalin dari sheet template di
+# spreadsheet yang sama. Baris 1-9 disalin apa adanya, baris 10 template diulang ke semua baris data.
+def template_sheet_from_env():
+    """Nama sheet template dari .env (kosong: format dibangun manual)"""
+    return os.getenv("FORMAT_TEMPLATE_SHEET", "")
+
+TEMPLATE_HEADER_ROWS = 9
+TEMPLATE_COLUMNS = 28  # A:AB
+
+def build_template_format_requests(template_sheet_id, sheet_id, max_rows, columns=TEMPLATE_COLUMNS):
+    """Dua request copyPaste (PASTE_FORMAT) dari sheet template; ukurannya tetap berapa pun barisnya"""
+    def grid(target_id, start_row, end_row):
+        return {
+            "sheetId": target_id,
+            "startRowIndex": start_row,
+            "endRowIndex": end_row,
+            "startColumnIndex": 0,
+            "endColumnIndex": columns,
+        }
+
+    def copy_format(source, destination):
+        return {
+            "copyPaste": {
+                "source": source,
+                "destination": destination,
+                "pasteType": "PASTE_FORMAT",
+                "pasteOrientation": "NORMAL",
+            }
+        }
+
+    return [
+        copy_format(grid(template_sheet_id, 0, TEMPLATE_HEADER_ROWS), grid(sheet_id, 0, TEMPLATE_HEADER_ROWS)),
+        copy_format(
+            grid(template_sheet_id, TEMPLATE_HEADER_ROWS, TEMPLATE_HEADER_ROWS + 1),
+            grid(sheet_id, TEMPLATE_HEADER_ROWS, max_rows),
+        ),
+    ]
+
+def atur_border_dan_format_sheet(sheet, spreadsheet_id, snapshot=None, template_sheet_id=None):
+    """Atur border dan formatting sheet"""
+    try:
+        service = get_sheets_service()
+        sheet_id = sheet._properties["sheetId"]
+        snapshot = snapshot or load_sheet_snapshot(sheet)
+        max_rows = max(snapshot.last_data_row, 10)
+
+        template_sheet = template_sheet_from_env()
+        if template_sheet_id is None and template_sheet:
+            template_sheet_id = fungsi_metadata.get_metadata(spreadsheet_id).sheet_id(template_sheet)
+        if template_sheet_id is not None:
+            requests = build_template_format_requests(template_sheet_id, sheet_id, max_rows)
+        else:
+            requests = build_format_requests(sheet_id, max_rows)
+
+        # Execute all requests
+        scheduler.execute(service.spreadsheets().batchUpdate(
             spreadsheetId=spreadsheet_id, 
             body={"requests": requests}
-        ).execute()
+        ), kind="write")
 
-        msg = f"🏷️ Named range '{clean_name}' Range → {range_a1}"
         
-        logging.info(msg)
+        logging.info("✅ Format border dan alignment berhasil diterapkan.")
         
     except Exception as e:
-        error_msg = f"⚠️ Gagal membuat named range untuk '{sheet_name}': {e}"
+        error_msg = f"⚠️ Gagal mengatur border/alignment: {e}"
         print(error_msg)
         logging.error(error_msg)
 
-def atur_border_dan_format_sheet(sheet, spreadsheet_id):
-    """Atur border dan formatting sheet"""
-    try:
-        service = get_sheets_service()
-        sheet_id = sheet._properties["sheetId"]
-        max_rows = max(len(sheet.col_values(3)), 10)
+# ============================ Request compiler ============================
+# Semua langkah main_tampilan_sheet disusun menjadi request spreadsheets.batchUpdate
+# sehingga satu sheet (atau beberapa sheet sekaligus) cukup satu panggilan API.
 
-        def range_obj(start_row, end_row, start_col, end_col):
-            return {
-                "sheetId": sheet_id,
-                "startRowIndex": start_row,
-                "endRowIndex": end_row,
-                "startColumnIndex": start_col,
-                "endColumnIndex": end_col,
+HYPERLINK_FORMULA = '=HYPERLINK("https://mocostore.moco.co.id/catalog/"&AB{row};"Klik Disini")'
+TOTAL_FORMULA = "=Y{row}*Z{row}"
+FILL_COLUMNS = [
+    ("A", "", "number"),
+    ("B", HYPERLINK_FORMULA, "dynamic"),
+    ("AA", TOTAL_FORMULA, "dynamic"),
+]
+SUMMARY_RANGE = "G2:J5"
+# Strategi isi kolom A/B/AA: "list" (satu nilai per baris) atau "server" (autoFill, payload tetap)
+FILL_LIST = "list"
+FILL_SERVER = "server"
+
+def fill_strategy_from_env():
+    return os.getenv("TAMPILAN_FILL", FILL_LIST)
+
+def sheets_per_batch_from_env():
+    return int(os.getenv("SHEETS_PER_BATCH", "1"))
+
+def workers_from_env():
+    return int(os.getenv("TAMPILAN_WORKERS", "4"))
+
+def cell_value(value):
+    """CellData userEnteredValue dari angka, rumus atau teks"""
+    if isinstance(value, (int, float)):
+        return {"userEnteredValue": {"numberValue": value}}
+    if isinstance(value, str) and value.startswith("="):
+        return {"userEnteredValue": {"formulaValue": value}}
+    return {"userEnteredValue": {"stringValue": value}}
+
+def build_rename_request(sheet_id, new_title):
+    """Request updateSheetProperties untuk ganti nama sheet"""
+    return {
+        "updateSheetProperties": {
+            "properties": {"sheetId": sheet_id, "title": new_title},
+            "fields": "title",
+        }
+    }
+
+def column_fill_values(start_row, last_row, value_or_formula, mode="static", start_number=1):
+    """Nilai kolom hasil autofill untuk baris start_row..last_row"""
+    values = []
+    for i, row in enumerate(range(start_row, last_row + 1)):
+        if mode == "number":
+            values.append(start_number + i)
+        elif mode == "dynamic":
+            values.append(value_or_formula.format(row=row))
+        else:
+            values.append(value_or_formula)
+    return values
+
+def update_cells_request(sheet_id, row, col_index, values):
+    """Request updateCells satu kolom mulai dari baris `row` (1-based)"""
+    return {
+        "updateCells": {
+            "rows": [{"values": [cell_value(value)]} for value in values],
+            "fields": "userEnteredValue",
+            "start": {"sheetId": sheet_id, "rowIndex": row - 1, "columnIndex": col_index},
+        }
+    }
+
+def build_column_fill_request(
+    sheet_id, col_letter, start_row, last_row, value_or_formula, mode="static", start_number=1
+):
+    """Request updateCells, setara autofill_column_general"""
+    col_index = gspread.utils.column_letter_to_index(col_letter) - 1
+    values = column_fill_values(start_row, last_row, value_or_formula, mode, start_number)
+    return update_cells_request(sheet_id, start_row, col_index, values)
+
+def build_server_fill_requests(
+    sheet_id, col_letter, start_row, last_row, value_or_formula, mode="static", start_number=1
+):
+    """Autofill di sisi server: tulis baris awal lalu autoFill ke bawah (payload tetap)"""
+    col_index = gspread.utils.column_letter_to_index(col_letter) - 1
+    # Mode number butuh dua nilai awal supaya autoFill melanjutkan deret 1, 2, 3, ...
+    seed_rows = 2 if mode == "number" else 1
+    seed_last_row = min(start_row + seed_rows - 1, last_row)
+    seed = column_fill_values(start_row, seed_last_row, value_or_formula, mode, start_number)
+    requests = [update_cells_request(sheet_id, start_row, col_index, seed)]
+
+    fill_length = last_row - seed_last_row
+    if fill_length > 0:
+        requests.append({
+            "autoFill": {
+                "useAlternateSeries": False,
+                "sourceAndDestination": {
+                    "source": {
+                        "sheetId": sheet_id,
+                        "startRowIndex": start_row - 1,
+                        "endRowIndex": seed_last_row,
+                        "startColumnIndex": col_index,
+                        "endColumnIndex": col_index + 1,
+                    },
+                    "dimension": "ROWS",
+                    "fillLength": fill_length,
+                },
             }
+        })
+    return requests
+
+def normalize_cell_value(value):
+    """Bentuk pembanding isi sel (angka vs teks, pemisah argumen ; vs ,)"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, str) and value.startswith("="):
+        return value.replace(";", ",").replace(" ", "")
+    return str(value)
+
+def changed_runs(desired, existing):
+    """Rentang berurutan yang isinya berbeda -> list (offset, nilai_baru)"""
+    runs = []
+    current = None
+    for i, value in enumerate(desired):
+        old = existing[i] if i < len(existing) else ""
+        if normalize_cell_value(value) == normalize_cell_value(old):
+            current = None
+            continue
+        if current is None:
+            current = (i, [])
+            runs.append(current)
+        current[1].append(value)
+    return runs
 
-        def full_border(range_obj):
-            border_style = {
-                "style": "SOLID",
-                "color": {"red": 0, "green": 0, "blue": 0},
+def build_column_fill_requests(
+    sheet_id, col_letter, start_row, last_row, value_or_formula, mode="static", start_number=1,
+    existing=None,
+):
+    """Request autofill satu kolom; bila `existing` diberikan hanya sel yang berbeda ditulis"""
+    if existing is None:
+        return [build_column_fill_request(
+            sheet_id, col_letter, start_row, last_row, value_or_formula, mode, start_number
+        )]
+    col_index = gspread.utils.column_letter_to_index(col_letter) - 1
+    desired = column_fill_values(start_row, last_row, value_or_formula, mode, start_number)
+    return [
+        update_cells_request(sheet_id, start_row + offset, col_index, values)
+        for offset, values in changed_runs(desired, existing)
+    ]
+
+def build_trim_rows_request(sheet_id, last_data_row, row_count):
+    """Request deleteDimension untuk baris kosong setelah tabel (None jika tidak perlu)"""
+    if last_data_row >= row_count:
+        return None
+    return {
+        "deleteDimension": {
+            "range": {
+                "sheetId": sheet_id,
+                "dimension": "ROWS",
+                "startIndex": last_data_row,
+                "endIndex": row_count,
             }
-            return {
-                "updateBorders": {
-                    "range": range_obj,
-                    "top": border_style,
-                    "bottom": border_style,
-                    "left": border_style,
-                    "right": border_style,
-                    "innerHorizontal": border_style,
-                    "innerVertical": border_style,
+        }
+    }
+
+def build_filter_freeze_requests(sheet_id, header_values, header_row=9, frozen_cols=10):
+    """Request setBasicFilter di baris header dan freeze panes"""
+    requests = []
+    if header_values:
+        requests.append({
+            "setBasicFilter": {
+                "filter": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "startRowIndex": header_row - 1,
+                        "endRowIndex": header_row,
+                        "startColumnIndex": 0,
+                        "endColumnIndex": len(header_values),
+                    }
                 }
             }
+        })
+    requests.append({
+        "updateSheetProperties": {
+            "properties": {
+                "sheetId": sheet_id,
+                "gridProperties": {"frozenRowCount": header_row, "frozenColumnCount": frozen_cols},
+            },
+            "fields": "gridProperties(frozenRowCount,frozenColumnCount)",
+        }
+    })
+    return requests
 
-        requests = []
-
-        # Add borders
-        requests.append(full_border(range_obj(0, 5, 5, 7)))  # F1:G4
-        requests.append(full_border(range_obj(0, 5, 8, 10)))  # I1:J5
-        requests.append(full_border(range_obj(8, max_rows, 0, 28)))  # A9:AB{maxRows}
-
-        # Format alignment & font
-        alignment_zones = [
-            (range_obj(0, 5, 5, 10), "CENTER", "MIDDLE", False),  # F1:J5
-            (range_obj(9, max_rows, 0, 2), "CENTER", "MIDDLE", False),  # A10:B
-            (range_obj(9, max_rows, 2, 5), "LEFT", "MIDDLE", False),  # C10:E
-            (range_obj(9, max_rows, 5, 7), "CENTER", "MIDDLE", False),  # F10:G
-            (range_obj(9, max_rows, 7, 9), "LEFT", "MIDDLE", False),  # H10:I
-            (range_obj(9, max_rows, 9, 10), "CENTER", "MIDDLE", False),  # J10
-            (range_obj(9, max_rows, 10, 24), "LEFT", "MIDDLE", False),  # K10:X
-            (range_obj(9, max_rows, 24, 28), "CENTER", "MIDDLE", False),  # Y10:AB
-        ]
+def build_summary_formula_requests(sheet_id, max_rows, existing=None):
+    """Request updateCells untuk rumus rekap G2:J5 (hanya yang berbeda bila `existing` ada)"""
+    requests = []
+    for cell, formula in summary_formulas(max_rows):
+        if existing is not None and normalize_cell_value(formula) == normalize_cell_value(existing.get(cell, "")):
+            continue
+        row, col = gspread.utils.a1_to_rowcol(cell)
+        requests.append(update_cells_request(sheet_id, row, col - 1, [formula]))
+    return requests
 
-        for rng, h_align, v_align, bold in alignment_zones:
-            requests.append({
-                "repeatCell": {
-                    "range": rng,
-                    "cell": {
-                        "userEnteredFormat": {
-                            "horizontalAlignment": h_align,
-                            "verticalAlignment": v_align,
-                            "textFormat": {"bold": bold},
-                        }
-                    },
-                    "fields": "userEnteredFormat(horizontalAlignment,verticalAlignment,textFormat)",
-                }
-            })
+def count_written_cells(requests):
+    """Jumlah sel yang ditulis oleh request updateCells"""
+    return sum(
+        sum(len(row.get("values", [])) for row in request["updateCells"].get("rows", []))
+        for request in requests if "updateCells" in request
+    )
 
-        # Format currency
-        currency_ranges = [
-            range_obj(3, 4, 6, 7),  # G4
-            range_obj(2, 4, 6, 7),  # G3:G4
-            range_obj(3, 4, 9, 10),  # J4
-        ]
-        
-        for cr in currency_ranges:
+def clean_range_name(title):
+    """Nama named range dari judul sheet (hanya huruf)"""
+    return re.sub(r"[^a-zA-Z]", "", title)
+
+GRID_RANGE_FIELDS = ("sheetId", "startRowIndex", "endRowIndex", "startColumnIndex", "endColumnIndex")
+
+def named_range_grid(sheet_id, last_row, header_row=10, col_start="J", col_end="J"):
+    """GridRange named range {col_start}{header_row}:{col_end}{last_row}"""
+    return a1_range_to_grid_range(f"{col_start}{header_row}:{col_end}{last_row}", sheet_id)
+
+def normalize_grid_range(grid_range):
+    """GridRange dengan semua field terisi (API tidak mengirim field bernilai 0)"""
+    return {field: grid_range.get(field, 0) for field in GRID_RANGE_FIELDS}
+
+def desired_named_ranges(plan, header_row=10, col_start="J", col_end="J", logger=print):
+    """Named range yang seharusnya ada untuk sheet di rencana -> {nama: GridRange}.
+    Dua sheet dengan nama bersih yang sama dilaporkan; sheet pertama yang dipakai"""
+    desired = {}
+    owners = {}
+    col_index = gspread.utils.column_letter_to_index(col_start)
+    for snapshot, title in plan:
+        clean_name = clean_range_name(title)
+        # Grid dipangkas sampai baris data terakhir, jadi range tidak boleh melewati jumlah baris hasil pangkas
+        last_row = min(snapshot.col_length(col_index), snapshot.trimmed_row_count)
+        if not clean_name:
+            logger(f"⚠️ Nama sheet '{title}' kosong setelah dibersihkan. Named range dilewati.")
+            continue
+        if last_row < header_row:
+            logger(f"⚠️ Sheet '{title}' tidak punya data setelah baris header. Named range dilewati.")
+            continue
+        if clean_name in owners:
+            error_msg = (f"⚠️ Named range '{clean_name}' bentrok: sheet '{title}' dan "
+                         f"'{owners[clean_name]}'. Sheet '{title}' dilewati.")
+            logger(error_msg)
+            logging.error(error_msg)
+            continue
+        owners[clean_name] = title
+        desired[clean_name] = named_range_grid(snapshot.sheet_id, last_row, header_row, col_start, col_end)
+    return desired
+
+def plan_named_range_sync(desired, existing, managed_sheet_ids, header_row=10, col_start="J", col_end="J"):
+    """Bandingkan named range yang diinginkan dengan yang ada.
+    existing: {nama: namedRange}. Named range lama di sheet yang dikelola dengan bentuk kolom
+    yang sama tapi namanya tidak diinginkan lagi ikut dihapus.
+    Hasil: (requests, {"add": n, "update": n, "delete": n}, nama yang bentrok dengan sheet lain)"""
+    requests = []
+    counts = {"add": 0, "update": 0, "delete": 0}
+    collisions = []
+    for name, grid_range in desired.items():
+        current = existing.get(name)
+        if current is None:
+            requests.append({"addNamedRange": {"namedRange": {"name": name, "range": grid_range}}})
+            counts["add"] += 1
+            continue
+        current_range = normalize_grid_range(current.get("range", {}))
+        if current_range["sheetId"] not in managed_sheet_ids:
+            collisions.append(name)
+            continue
+        if current_range != normalize_grid_range(grid_range):
             requests.append({
-                "repeatCell": {
-                    "range": cr,
-                    "cell": {
-                        "userEnteredFormat": {
-                            "numberFormat": {
-                                "type": "CURRENCY",
-                                "pattern": "[$Rp-421] #,##0",
-                            }
-                        }
+                "updateNamedRange": {
+                    "namedRange": {
+                        "namedRangeId": current["namedRangeId"], "name": name, "range": grid_range,
                     },
-                    "fields": "userEnteredFormat.numberFormat",
+                    "fields": "range",
                 }
             })
+            counts["update"] += 1
 
-        # Execute all requests
-        service.spreadsheets().batchUpdate(
-            spreadsheetId=spreadsheet_id, 
-            body={"requests": requests}
-        ).execute()
+    start_col = gspread.utils.column_letter_to_index(col_start) - 1
+    end_col = gspread.utils.column_letter_to_index(col_end)
+    for name, current in existing.items():
+        current_range = normalize_grid_range(current.get("range", {}))
+        if (
+            name not in desired
+            and current_range["sheetId"] in managed_sheet_ids
+            and current_range["startRowIndex"] == header_row - 1
+            and (current_range["startColumnIndex"], current_range["endColumnIndex"]) == (start_col, end_col)
+        ):
+            requests.append({"deleteNamedRange": {"namedRangeId": current["namedRangeId"]}})
+            counts["delete"] += 1
+    return requests, counts, collisions
 
-        
-        logging.info("✅ Format border dan alignment berhasil diterapkan.")
-        
+def sync_named_ranges(
+    spreadsheet_id, desired, managed_sheet_ids, logger=print, dry_run=False,
+    header_row=10, col_start="J", col_end="J",
+):
+    """Samakan named range spreadsheet dengan `desired` dalam satu batchUpdate"""
+    metadata = fungsi_metadata.get_metadata(spreadsheet_id)
+    requests, counts, collisions = plan_named_range_sync(
+        desired, metadata.named_ranges, set(managed_sheet_ids), header_row, col_start, col_end
+    )
+    for name in collisions:
+        error_msg = f"⚠️ Named range '{name}' sudah dipakai sheet lain. Dilewati."
+        logger(error_msg)
+        logging.error(error_msg)
+
+    summary = (f"{counts['add']} ditambah, {counts['update']} diperbarui, "
+               f"{counts['delete']} dihapus")
+    if not requests:
+        logger("🏷️ Named range sudah sesuai.")
+        return
+    if dry_run:
+        logger(f"🏷️ [dry-run] Named range: {summary}")
+        return
+
+    response = scheduler.execute(get_sheets_service().spreadsheets().batchUpdate(
+        spreadsheetId=spreadsheet_id, body={"requests": requests}
+    ), kind="write")
+
+    for request, reply in zip(requests, response.get("replies", [])):
+        if "addNamedRange" in request:
+            metadata.set_named_range(reply["addNamedRange"]["namedRange"])
+        elif "updateNamedRange" in request:
+            metadata.set_named_range(request["updateNamedRange"]["namedRange"])
+        else:
+            named_range_id = request["deleteNamedRange"]["namedRangeId"]
+            name = next((n for n, r in metadata.named_ranges.items() if r["namedRangeId"] == named_range_id), None)
+            if name:
+                metadata.remove_named_range(name)
+    logger(f"🏷️ Named range: {summary} (1 batchUpdate)")
+
+def compile_sheet_requests(
+    snapshot, new_title, start_row=10, logger=print, fill_strategy=None, template_sheet_id=None
+):
+    """Susun semua langkah tampilan satu sheet menjadi daftar request batchUpdate"""
+    fill_strategy = fill_strategy or fill_strategy_from_env()
+    sheet_id = snapshot.sheet_id
+    last_row = max(snapshot.last_data_row, start_row)
+    max_rows = max(snapshot.last_data_row, 10)
+
+    requests = []
+    if new_title != snapshot.title:
+        requests.append(build_rename_request(sheet_id, new_title))
+
+    existing = snapshot.existing_values
+    # Sheet tanpa baris data: grid tidak dipangkas dan baris data tidak diisi/diformat,
+    # supaya tidak ada range di luar grid yang membuat seluruh batch ditolak
+    if not snapshot.has_data_rows:
+        logger("⚠️ Tidak ada data di bawah header. Isi kolom, pangkas baris dan format dilewati.")
+    for col_letter, value_or_formula, mode in FILL_COLUMNS if snapshot.has_data_rows else []:
+        if fill_strategy == FILL_SERVER:
+            requests += build_server_fill_requests(
+                sheet_id, col_letter, start_row, last_row, value_or_formula, mode
+            )
+        else:
+            requests += build_column_fill_requests(
+                sheet_id, col_letter, start_row, last_row, value_or_formula, mode,
+                existing=existing[col_letter] if existing is not None else None,
+            )
+
+    if snapshot.has_data_rows:
+        trim_request = build_trim_rows_request(sheet_id, snapshot.last_data_row, snapshot.row_count)
+        if trim_request:
+            requests.append(trim_request)
+
+    if not snapshot.header_values:
+        logger("⚠️ Tidak ada header di baris 9. Filter dilewati.")
+    requests += build_filter_freeze_requests(sheet_id, snapshot.header_values)
+    requests += build_summary_formula_requests(
+        sheet_id, max_rows, existing=existing["summary"] if existing is not None else None
+    )
+    if not snapshot.has_data_rows:
+        return requests
+    if template_sheet_id is not None:
+        requests += build_template_format_requests(template_sheet_id, sheet_id, max_rows)
+    else:
+        requests += build_format_requests(sheet_id, max_rows)
+    return requests
+
+def execute_sheet_batch(spreadsheet, pending, logger=print):
+    """Kirim request beberapa sheet dalam satu batchUpdate dan perbarui state lokal"""
+    if not pending:
+        return
+    requests = [request for _, _, sheet_requests in pending for request in sheet_requests]
+    titles = ", ".join(new_title for _, new_title, _ in pending)
+    try:
+        scheduler.call(spreadsheet.batch_update, {"requests": requests}, kind="write")
+    except scheduler.RunStopped:
+        logger(f"⏹️ Sheet {titles} tidak dikirim karena proses dihentikan.")
+        return
     except Exception as e:
-        error_msg = f"⚠️ Gagal mengatur border/alignment: {e}"
-        print(error_msg)
+        fungsi_metadata.invalidate(spreadsheet.id)
+        error_msg = f"⚠️ Gagal memproses sheet {titles}: {e}"
+        logger(error_msg)
         logging.error(error_msg)
+        return
+
+    for snapshot, new_title, _ in pending:
+        if new_title != snapshot.title:
+            logger(f"🔤 Rename: '{snapshot.title}' → '{new_title}'")
+        snapshot.title = new_title
+        snapshot.row_count = snapshot.trimmed_row_count
+        snapshot.processed = True
+        fungsi_metadata.record_rename(spreadsheet.id, snapshot.sheet_id, new_title)
+        fungsi_metadata.record_row_count(spreadsheet.id, snapshot.sheet_id, snapshot.row_count)
+        logger(f"🎯 Proses sheet '{new_title}' selesai.")
+    logger(f"📨 {len(requests)} request dikirim dalam 1 batchUpdate ({len(pending)} sheet)")
+    logger("")
+    logging.info(f"✅ Batch selesai: {titles}")
+
+def plan_sheet_batches(plan, sheets_per_batch=None):
+    """Kelompokkan rencana (snapshot, judul_baru) ke dalam batch berisi beberapa sheet"""
+    if sheets_per_batch is None:
+        sheets_per_batch = sheets_per_batch_from_env()
+    return [plan[i:i + sheets_per_batch] for i in range(0, len(plan), max(1, sheets_per_batch))]
+
+def process_sheet_batch(spreadsheet, batch, start_row=10, template_sheet_id=None):
+    """Susun dan kirim satu batch sheet. Log dikumpulkan supaya bisa dicetak berurutan"""
+    lines = []
+    if get_stop_requested():
+        return lines
+    pending = []
+    with fungsi_trace.step("proses sheet", sheet=", ".join(new_title for _, new_title in batch)):
+        for snapshot, new_title in batch:
+            lines.append(f"✅ Memproses Sheet: {new_title}")
+            requests = compile_sheet_requests(
+                snapshot, new_title, start_row, lines.append, template_sheet_id=template_sheet_id
+            )
+            pending.append((snapshot, new_title, requests))
+        execute_sheet_batch(spreadsheet, pending, lines.append)
+    return lines
 
-def main_tampilan_sheet(logger=print):
-    """Fungsi utama untuk memproses tampilan sheet"""
+def run_sheet_batches(
+    spreadsheet, batches, start_row=10, logger=print, workers=None, template_sheet_id=None,
+    journal=None,
+):
+    """Jalankan semua batch di thread pool; log tiap batch dicetak sesuai urutan sheet.
+    Sheet yang selesai dicatat ke jurnal run (bila ada) supaya bisa dilewati saat dilanjutkan."""
+    if get_stop_requested():
+        return False
+    if workers is None:
+        workers = workers_from_env()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [
+            pool.submit(process_sheet_batch, spreadsheet, batch, start_row, template_sheet_id)
+            for batch in batches
+        ]
+        for batch, future in zip(batches, futures):
+            if get_stop_requested():
+                for f in futures:
+                    f.cancel()
+            try:
+                lines = future.result()
+            except (CancelledError, scheduler.RunStopped):
+                continue
+            for line in lines:
+                logger(line)
+            if journal is not None:
+                for snapshot, new_title in batch:
+                    if snapshot.processed:
+                        journal.update_sheet(
+                            snapshot.sheet_id, save=False, title=new_title,
+                            fingerprint=snapshot.fingerprint(), steps=["proses"],
+                        )
+                journal.save()
+    return not get_stop_requested()
+
+@fungsi_trace.traced_run("tampilan")
+def main_tampilan_sheet(logger=print, full=None, diff=None, dry_run=False, resume=False):
+    """Fungsi utama untuk memproses tampilan sheet (resume=True: lanjutkan run terakhir)"""
+    journal = None
     try:
         logger("📄 Menjalankan tampilan sheet...")
         
-        # Load environment variables
+        # Load environment variables (.env repo; nilai yang sudah ada di environment tidak ditimpa)
+        load_dotenv()
         SPREADSHEET_NAME = os.getenv("SPREADSHEET_NAME", "")
         SPREADSHEET_ID = os.getenv("SPREADSHEET_ID", "")
         if not SPREADSHEET_ID:
@@ -386,15 +1049,46 @@ def main_tampilan_sheet(logger=print):
 
         excluded_sheets = os.getenv("EXCLUDED_SHEETS", "")
         excluded_sheets = [s.strip() for s in excluded_sheets.split(",") if s.strip()]
-        
+
+        # Lanjutkan run terakhir dengan parameter yang sama
+        if resume:
+            journal = fungsi_journal.load_unfinished("tampilan", SPREADSHEET_ID)
+            if journal is None:
+                logger("ℹ️ Tidak ada run Tampilan Sheet yang bisa dilanjutkan.")
+                return
+            full, diff, dry_run = journal.params["full"], journal.params["diff"], False
+            logger(f"↩️ Melanjutkan run terakhir ({len(journal.data['sheets'])} sheet sudah selesai)")
+
+        if full is None:
+            full = os.getenv("TAMPILAN_FULL", "0") == "1"
+        if diff is None:
+            diff = os.getenv("TAMPILAN_DIFF", "0") == "1"
+        if journal is None and not dry_run:
+            journal = fungsi_journal.start("tampilan", SPREADSHEET_ID, {"full": full, "diff": diff})
+
         SHEET_MULAI = int(os.getenv("SHEET_MULAI", "1"))
         START_SHEET_INDEX = SHEET_MULAI + 2
         START_ROW = 10
         
         # Setup Google Sheets
+        # Satu request metadata kecil untuk seluruh run
+        scheduler.get_scheduler().reset_stats()
         gc = setup_google_sheets()
-        sh = gc.open_by_key(SPREADSHEET_ID)
-        worksheets = sh.worksheets()
+        with fungsi_trace.step("metadata"):
+            metadata = fungsi_metadata.get_metadata(SPREADSHEET_ID, refresh=True)
+        sh = fungsi_metadata.open_spreadsheet(gc, metadata)
+        worksheets = fungsi_metadata.worksheets(sh, metadata)
+
+        # Mode template: sheet template jadi acuan format dan tidak ikut diproses
+        template_sheet_id = None
+        FORMAT_TEMPLATE_SHEET = template_sheet_from_env()
+        if FORMAT_TEMPLATE_SHEET:
+            template_sheet_id = metadata.sheet_id(FORMAT_TEMPLATE_SHEET)
+            if template_sheet_id is None:
+                logger(f"⚠️ Sheet template '{FORMAT_TEMPLATE_SHEET}' tidak ditemukan. Format dibangun manual.")
+            else:
+                excluded_sheets.append(FORMAT_TEMPLATE_SHEET)
+                logger(f"🧩 Format disalin dari sheet template '{FORMAT_TEMPLATE_SHEET}'")
 
         logger(f"🔄 Mulai proses semua sheet...\n")
         logger(f"📂 Nama Spreadsheet: {sh.title}")
@@ -402,62 +1096,132 @@ def main_tampilan_sheet(logger=print):
 
         sheet_number = SHEET_MULAI if SHEET_MULAI > 0 else 1
 
-        for i, sheet in enumerate(worksheets[START_SHEET_INDEX:], start=START_SHEET_INDEX):
-            
-            if get_stop_requested():
-                logger("⏹️ Proses dihentikan oleh pengguna.")
-                logging.info("Proses dihentikan oleh pengguna")
-                break
+        # Satu batchGet untuk data semua sheet yang akan diproses
+        with fungsi_trace.step("snapshot"):
+            snapshots = load_sheet_snapshots(sh, [
+                ws for ws in worksheets[START_SHEET_INDEX:] if ws.title not in excluded_sheets
+            ])
 
+        # Penomoran semua sheet dihitung dulu lalu dikirim dalam satu batchUpdate,
+        # setelah itu sheet diproses paralel
+        targets = []
+        for sheet in worksheets[START_SHEET_INDEX:]:
             if sheet.title in excluded_sheets:
                 logger(f"➡️ Sheet '{sheet.title}' dilewati.")
                 continue
-
-            # Rename sheet
-            sheet, new_title = rename_sheet_with_number(sh, sheet, sheet_number)
+            targets.append((snapshots[sheet.id], numbered_title(sheet.title, sheet_number)))
             sheet_number += 1
 
-            logger(f"✅ Memproses Sheet: {new_title}")
+        with fungsi_trace.step("rename"):
+            final_titles = renumber_sheets(
+                sh, {ws.id: ws.title for ws in worksheets},
+                {snapshot.sheet_id: new_title for snapshot, new_title in targets},
+                logger=logger, dry_run=dry_run,
+            )
+        plan = []
+        for snapshot, _ in targets:
+            if not dry_run:
+                snapshot.title = final_titles[snapshot.sheet_id]
+            plan.append((snapshot, final_titles[snapshot.sheet_id]))
 
-            # Process columns
-            autofill_column_general(sheet, "A", START_ROW, "", mode="number")
-            logger("✅ Nomor urut di kolom A selesai")
+        # Named range semua sheet dihitung dari snapshot (termasuk sheet yang nanti dilewati)
+        desired_ranges = desired_named_ranges(plan, logger=logger)
+        managed_sheet_ids = {snapshot.sheet_id for snapshot, _ in plan}
 
-            autofill_column_general(
-                sheet,
-                "B",
-                START_ROW,
-                '=HYPERLINK("https://mocostore.moco.co.id/catalog/"&AB{row};"Klik Disini")',
-                mode="dynamic",
-            )
-            logger("✅ Kolom B diisi hyperlink")
+        # Mode incremental: lewati sheet yang fingerprint-nya sama dengan run sebelumnya
+        with fungsi_trace.step("incremental"):
+            load_last_rows(sh, [snapshot for snapshot, _ in plan])
+        saved_state = fungsi_statesheet.load_state(sh.id)
+        state = {
+            str(snapshot.sheet_id): saved_state[str(snapshot.sheet_id)]
+            for snapshot, _ in plan if str(snapshot.sheet_id) in saved_state
+        }
+        # Mode lanjutkan: lewati sheet yang sudah selesai di run terputus dan belum berubah sejak itu
+        if resume:
+            remaining_plan = []
+            for snapshot, new_title in plan:
+                if journal.sheet(snapshot.sheet_id).get("fingerprint") == snapshot.fingerprint():
+                    state[str(snapshot.sheet_id)] = snapshot.fingerprint()
+                else:
+                    remaining_plan.append((snapshot, new_title))
+            logger(f"⏭️ {len(plan) - len(remaining_plan)} sheet sudah selesai di run sebelumnya dilewati")
+            plan = remaining_plan
+        if not full:
+            changed_plan = [
+                (snapshot, new_title) for snapshot, new_title in plan
+                if new_title != snapshot.title
+                or state.get(str(snapshot.sheet_id)) != snapshot.fingerprint()
+            ]
+            logger(f"⏭️ {len(plan) - len(changed_plan)} sheet tidak berubah dilewati, "
+                   f"{len(changed_plan)} sheet diproses")
+            plan = changed_plan
 
-            autofill_column_general(
-                sheet, "AA", START_ROW, "=Y{row}*Z{row}", mode="dynamic"
-            )
-            logger("✅ Kolom AA dihitung dari Y*Z")
-
-            # Apply formatting and features
-            clear_rows_after_table(sheet, data_col="C", logger=logger)
-            ensure_filter_and_freeze(sheet, logger)
-            add_formulas(sheet)
-            atur_border_dan_format_sheet(sheet, spreadsheet_id=sh.id)
-
-            create_named_range_from_sheet_name(
-                spreadsheet_id=sh.id, 
-                sheet=sheet, 
-                header_row=10, 
-                col_start="J", 
-                col_end="J"
-            )
+        if diff:
+            with fungsi_trace.step("diff"):
+                load_existing_values(sh, [snapshot for snapshot, _ in plan], START_ROW)
+
+        if dry_run:
+            # Hanya tampilkan rencana penulisan, tanpa mengirim apa pun
+            for snapshot, new_title in plan:
+                requests = compile_sheet_requests(
+                    snapshot, new_title, START_ROW, logger, template_sheet_id=template_sheet_id
+                )
+                logger(f"📝 [dry-run] {new_title}: {len(requests)} request, "
+                       f"{count_written_cells(requests)} sel ditulis")
+            sync_named_ranges(sh.id, desired_ranges, managed_sheet_ids, logger=logger, dry_run=True)
+            logger(scheduler.get_scheduler().summary())
+            return
+
+        batches = plan_sheet_batches(plan)
+        completed = run_sheet_batches(
+            sh, batches, START_ROW, logger, template_sheet_id=template_sheet_id, journal=journal
+        )
+
+        # Semua named range disinkronkan sekaligus setelah sheet selesai diproses
+        status = fungsi_journal.STATUS_DONE
+        if completed:
+            try:
+                with fungsi_trace.step("named range"):
+                    sync_named_ranges(sh.id, desired_ranges, managed_sheet_ids, logger=logger)
+            except scheduler.RunStopped:
+                completed = False
+            except Exception as e:
+                status = fungsi_journal.STATUS_FAILED
+                fungsi_metadata.invalidate(sh.id)
+                error_msg = f"⚠️ Gagal menyinkronkan named range: {e}"
+                logger(error_msg)
+                logging.error(error_msg)
+
+        for snapshot, _ in plan:
+            if snapshot.processed:
+                state[str(snapshot.sheet_id)] = snapshot.fingerprint()
+        fungsi_statesheet.save_state(sh.id, state, sheet_ids=[ws.id for ws in worksheets])
+
+        failed = [new_title for snapshot, new_title in plan if not snapshot.processed]
+        if completed and failed:
+            status = fungsi_journal.STATUS_FAILED
+            logger(f"⚠️ {len(failed)} sheet gagal diproses. Gunakan 'Lanjutkan run terakhir' untuk mengulang.")
+
+        if not completed:
+            journal.finish(fungsi_journal.STATUS_STOPPED)
+            logger("⏹️ Proses dihentikan oleh pengguna.")
+            logging.info("Proses dihentikan oleh pengguna")
+            return
 
-            logger(f"🎯 Proses sheet '{new_title}' selesai.")
-            logger("")
+        journal.finish(status)
 
         logger("🎉 Semua sheet selesai diproses!")
+        logger(scheduler.get_scheduler().summary())
         logging.info("🎉 Semua sheet selesai diproses!")
 
+    except scheduler.RunStopped:
+        if journal is not None:
+            journal.finish(fungsi_journal.STATUS_STOPPED)
+        logger("⏹️ Proses dihentikan oleh pengguna.")
+        logging.info("Proses dihentikan oleh pengguna")
     except Exception as e:
+        if journal is not None:
+            journal.finish(fungsi_journal.STATUS_FAILED)
         error_msg = f"❌ Terjadi error saat proses utama: {e}"
         logger(error_msg)
         logging.error(error_msg)
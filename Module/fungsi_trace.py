@@ -0,0 +1,285 @@
+import os
+import json
+import time
+import functools
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit, parse_qs, unquote
+from globals import repo_path
+
+# Tracing panggilan API dan waktu per langkah.
+# Setiap panggilan lewat fungsi_scheduler dicatat (metode, range, ukuran payload, latensi, retry,
+# tunggu kuota) bersama langkah dan sheet yang sedang berjalan. Di akhir run ditulis trace JSON
+# dan file teks Prometheus (untuk textfile collector node_exporter).
+
+NO_STEP = "lainnya"
+
+def trace_dirs_from_env():
+    """(folder trace, folder metrik) relatif terhadap folder repo, dibaca saat run ditutup"""
+    trace_dir = os.getenv("TRACE_DIR", "trace")
+    return repo_path(trace_dir), repo_path(os.getenv("TRACE_METRICS_DIR", trace_dir))
+
+def trace_keep_from_env():
+    return int(os.getenv("TRACE_KEEP", "20"))
+
+_local = threading.local()
+_lock = threading.Lock()
+_current = None
+_last = None
+
+class RunTrace:
+    """Catatan satu run: semua panggilan API dan durasi tiap langkah"""
+
+    def __init__(self, workflow):
+        self.workflow = workflow
+        self.run_id = time.strftime("%Y%m%d-%H%M%S")
+        self.started = time.time()
+        self.duration = None
+        self.calls = []
+        self.steps = []
+        self.lock = threading.Lock()
+
+    def record_call(self, event):
+        with self.lock:
+            self.calls.append(event)
+
+    def record_step(self, step, sheet, duration):
+        with self.lock:
+            self.steps.append({"step": step, "sheet": sheet, "duration": duration})
+
+    def step_summary(self):
+        """Ringkasan per langkah (urut kemunculan)"""
+        summary = {}
+
+        def row(step):
+            return summary.setdefault(step, {
+                "step": step, "duration": 0.0, "calls": 0, "api_time": 0.0, "retries": 0,
+                "quota_wait": 0.0, "backoff_wait": 0.0, "bytes_sent": 0, "bytes_received": 0,
+            })
+
+        with self.lock:
+            for s in self.steps:
+                row(s["step"])["duration"] += s["duration"]
+            for c in self.calls:
+                r = row(c["step"])
+                r["calls"] += 1
+                r["api_time"] += c["latency"]
+                r["retries"] += c["retries"]
+                r["quota_wait"] += c["quota_wait"]
+                r["backoff_wait"] += c["backoff_wait"]
+                r["bytes_sent"] += c["bytes_sent"]
+                r["bytes_received"] += c["bytes_received"]
+        return list(summary.values())
+
+    def sheet_summary(self, limit=5):
+        """Sheet dengan waktu API terbesar -> list (sheet, panggilan, waktu API)"""
+        totals = {}
+        with self.lock:
+            for c in self.calls:
+                if c["sheet"]:
+                    calls, api_time = totals.get(c["sheet"], (0, 0.0))
+                    totals[c["sheet"]] = (calls + 1, api_time + c["latency"])
+        ranked = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)
+        return [(sheet, calls, api_time) for sheet, (calls, api_time) in ranked[:limit]]
+
+    def summary_lines(self):
+        """Tabel ringkasan untuk log"""
+        lines = [
+            f"{'langkah':<16} {'durasi':>8} {'API':>5} {'waktu API':>9} {'retry':>5} {'kuota':>7} {'KB':>8}",
+        ]
+        for r in self.step_summary():
+            lines.append(
+                f"{r['step'][:16]:<16} {r['duration']:>7.1f}s {r['calls']:>5} {r['api_time']:>8.1f}s "
+                f"{r['retries']:>5} {r['quota_wait']:>6.1f}s "
+                f"{(r['bytes_sent'] + r['bytes_received']) / 1024:>8.1f}"
+            )
+        for sheet, calls, api_time in self.sheet_summary():
+            lines.append(f"  ⏱️ {sheet}: {calls} panggilan, {api_time:.1f} dtk API")
+        return lines
+
+    def to_dict(self):
+        with self.lock:
+            calls = list(self.calls)
+            steps = list(self.steps)
+        return {
+            "workflow": self.workflow,
+            "run_id": self.run_id,
+            "started": self.started,
+            "duration": self.duration,
+            "summary": self.step_summary(),
+            "steps": steps,
+            "calls": calls,
+        }
+
+    def prometheus_text(self):
+        """Metrik format teks Prometheus untuk run ini"""
+        def labels(**values):
+            return ",".join(f'{k}="{escape_label(v)}"' for k, v in values.items())
+
+        # Semua nilai adalah nilai run terakhir, jadi bertipe gauge
+        metrics = [
+            ("katalog_api_calls", "Jumlah panggilan API per langkah", "calls"),
+            ("katalog_api_seconds", "Total latensi panggilan API per langkah", "api_time"),
+            ("katalog_api_retries", "Jumlah retry panggilan API per langkah", "retries"),
+            ("katalog_api_quota_wait_seconds", "Waktu menunggu kuota per langkah", "quota_wait"),
+            ("katalog_api_backoff_seconds", "Waktu backoff per langkah", "backoff_wait"),
+            ("katalog_api_sent_bytes", "Byte payload terkirim per langkah", "bytes_sent"),
+            ("katalog_api_received_bytes", "Byte respons diterima per langkah", "bytes_received"),
+            ("katalog_step_seconds", "Durasi langkah", "duration"),
+        ]
+        summary = self.step_summary()
+        lines = []
+        for name, help_text, field in metrics:
+            lines.append(f"# HELP {name} {help_text} (run terakhir)")
+            lines.append(f"# TYPE {name} gauge")
+            for r in summary:
+                lines.append(f"{name}{{{labels(workflow=self.workflow, step=r['step'])}}} {r[field]}")
+        lines += [
+            "# HELP katalog_run_seconds Durasi run terakhir",
+            "# TYPE katalog_run_seconds gauge",
+            f"katalog_run_seconds{{{labels(workflow=self.workflow)}}} {self.duration or 0}",
+            "# HELP katalog_run_timestamp_seconds Waktu mulai run terakhir",
+            "# TYPE katalog_run_timestamp_seconds gauge",
+            f"katalog_run_timestamp_seconds{{{labels(workflow=self.workflow)}}} {self.started}",
+        ]
+        return "\n".join(lines) + "\n"
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def write_atomic(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def prune_traces(trace_dir, workflow, keep=None):
+    """Simpan hanya `keep` trace JSON terakhir per workflow"""
+    keep = trace_keep_from_env() if keep is None else keep
+    prefix = f"{workflow}-"
+    traces = sorted(f for f in os.listdir(trace_dir) if f.startswith(prefix) and f.endswith(".json"))
+    for name in traces[:-keep] if keep > 0 else []:
+        os.remove(os.path.join(trace_dir, name))
+
+def start_run(workflow):
+    global _current
+    trace = RunTrace(workflow)
+    with _lock:
+        _current = trace
+    return trace
+
+def finish_run(logger=print):
+    """Tutup run aktif: log tabel ringkasan, tulis trace JSON dan metrik Prometheus"""
+    global _current, _last
+    with _lock:
+        trace, _current = _current, None
+    if trace is None:
+        return None
+    trace.duration = time.time() - trace.started
+    with _lock:
+        _last = trace
+
+    for line in trace.summary_lines():
+        logger(line)
+    try:
+        trace_dir, metrics_dir = trace_dirs_from_env()
+        trace_path = os.path.join(trace_dir, f"{trace.workflow}-{trace.run_id}.json")
+        write_atomic(trace_path, json.dumps(trace.to_dict(), ensure_ascii=False, indent=1))
+        prune_traces(trace_dir, trace.workflow)
+        write_atomic(os.path.join(metrics_dir, f"katalog_{trace.workflow}.prom"), trace.prometheus_text())
+        logger(f"🧾 Trace: {trace_path}")
+    except OSError as e:
+        logger(f"⚠️ Gagal menulis trace: {e}")
+    return trace
+
+def last_run():
+    """Run terakhir yang sudah selesai (untuk tabel ringkasan di jendela)"""
+    with _lock:
+        return _last
+
+def traced_run(workflow):
+    """Decorator fungsi utama: seluruh pemanggilan menjadi satu run trace"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start_run(workflow)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                finish_run(kwargs.get("logger", args[0] if args else print))
+        return wrapper
+    return decorator
+
+def current_context():
+    """(langkah, sheet) yang sedang berjalan di thread ini"""
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else (NO_STEP, None)
+
+@contextmanager
+def step(name, sheet=None):
+    """Tandai langkah pipeline (dan sheet-nya); panggilan API di dalamnya dikelompokkan ke sini"""
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    if sheet is None and stack:
+        sheet = stack[-1][1]
+    stack.append((name, sheet))
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stack.pop()
+        trace = _current
+        if trace is not None:
+            trace.record_step(name, sheet, time.perf_counter() - started)
+
+def payload_size(value):
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+def describe_call(fn, args, kwargs):
+    """(metode, range, byte terkirim) dari panggilan googleapiclient atau gspread"""
+    request = getattr(fn, "__self__", None)
+    method_id = getattr(request, "methodId", None)
+    if method_id:
+        query = parse_qs(urlsplit(request.uri).query)
+        ranges = query.get("ranges") or query.get("range") or []
+        if not ranges and "/values/" in request.uri:
+            ranges = [unquote(urlsplit(request.uri).path.split("/values/", 1)[1])]
+        return method_id, ", ".join(ranges[:3]) + (" …" if len(ranges) > 3 else ""), payload_size(request.body)
+
+    method = getattr(fn, "__qualname__", getattr(fn, "__name__", repr(fn)))
+    range_arg = next((a for a in args if isinstance(a, (str, list))), kwargs.get("ranges") or kwargs.get("range"))
+    if isinstance(range_arg, list):
+        range_arg = ", ".join(str(r) for r in range_arg[:3]) + (" …" if len(range_arg) > 3 else "")
+    return method, range_arg or "", payload_size([args, kwargs])
+
+def record_call(fn, args, kwargs, kind, latency, retries, quota_wait, backoff_wait, status, result=None):
+    """Catat satu panggilan API ke run aktif (dipanggil oleh fungsi_scheduler)"""
+    trace = _current
+    if trace is None:
+        return
+    method, range_a1, bytes_sent = describe_call(fn, args, kwargs)
+    step_name, sheet = current_context()
+    trace.record_call({
+        "time": time.time(),
+        "step": step_name,
+        "sheet": sheet,
+        "method": method,
+        "kind": kind,
+        "range": range_a1,
+        "bytes_sent": bytes_sent,
+        "bytes_received": payload_size(result) if result is not None else 0,
+        "latency": latency,
+        "retries": retries,
+        "quota_wait": quota_wait,
+        "backoff_wait": backoff_wait,
+        "status": status,
+    })
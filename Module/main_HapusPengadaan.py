@@ -1,33 +1,63 @@
 import tkinter as tk
-from tkinter import scrolledtext
+from tkinter import ttk, scrolledtext, filedialog
 import threading
+from globals import set_stop_requested
+from Module import fungsi_trace
+from Module import fungsi_logpump
 from Module import fungsi_hapuspengadaan  # nama file kamu (tanpa .py), pastikan sesuai
 
 def show_window(root):
-    def run_hapus_pengadaan():
-        text_log.configure(state="normal")
-        text_log.delete(1.0, tk.END)
-        text_log.configure(state="disabled")
-
-        def logger(msg):
-            text_log.configure(state="normal")
-            text_log.insert(tk.END, msg + "\n")
-            text_log.see(tk.END)
-            text_log.configure(state="disabled")
+    def run_hapus_pengadaan(resume=False):
+        set_stop_requested(False)
+        log_pump.start_run()
+        file_path = None
+        if not resume:
+            log_pump("📤 Silakan pilih file (.xlsx/.csv/.parquet) yang berisi data penghapusan...")
+            # Dialog file harus dibuka di thread Tk
+            file_path = filedialog.askopenfilename(filetypes=fungsi_hapuspengadaan.DELETION_FILETYPES)
+            if not file_path:
+                log_pump("❌ Tidak ada file dipilih. Proses dibatalkan.")
+                log_pump.finish_run()
+                return
+        options = {"mode": mode_var.get(), "use_index": index_var.get(), "resume": resume}
 
         def target():
             try:
-                fungsi_hapuspengadaan.main_hapus_pengadaan(logger=logger)
+                fungsi_hapuspengadaan.main_hapus_pengadaan(logger=log_pump, file_path=file_path, **options)
             finally:
-                run_button.config(state="normal")
+                log_pump.call(finish_run)
+                log_pump.finish_run()
 
         threading.Thread(target=target).start()
         run_button.config(state="disabled")
+        resume_button.config(state="disabled")
+        stop_button.config(state="normal")
+
+    def stop_process():
+        set_stop_requested(True)
+        stop_button.config(state="disabled")
+
+    def finish_run():
+        run_button.config(state="normal")
+        resume_button.config(state="normal")
+        stop_button.config(state="disabled")
+        fill_summary()
+
+    def fill_summary():
+        summary_tree.delete(*summary_tree.get_children())
+        trace = fungsi_trace.last_run()
+        if trace is None:
+            return
+        for r in trace.step_summary():
+            summary_tree.insert("", tk.END, values=(
+                r["step"], f"{r['duration']:.1f} dtk", r["calls"], f"{r['api_time']:.1f} dtk",
+                r["retries"], f"{r['quota_wait']:.1f} dtk", f"{(r['bytes_sent'] + r['bytes_received']) / 1024:.1f}",
+            ))
 
     # Buat window baru
     window = tk.Toplevel()
     window.title("🗑️ Hapus Data Pengadaan")
-    window.geometry("700x400")
+    window.geometry("700x560")
     window.configure(bg="white")
     root.withdraw()
 
@@ -40,10 +70,43 @@ def show_window(root):
     title = tk.Label(window, text="🗑️ Hapus Data Pengadaan", font=("Helvetica", 16, "bold"), bg="white")
     title.pack(pady=10)
 
-    global run_button
-    run_button = tk.Button(window, text="🔍 Pilih File & Hapus", bg="#B22222", fg="white", font=("Helvetica", 12), command=run_hapus_pengadaan)
-    run_button.pack(pady=10)
+    # Pilihan mode hapus
+    mode_var = tk.StringVar(value=fungsi_hapuspengadaan.MODE_SEMUA)
+    mode_frame = tk.Frame(window, bg="white")
+    mode_frame.pack()
+    tk.Radiobutton(mode_frame, text="Hapus semua baris yang cocok", variable=mode_var,
+                   value=fungsi_hapuspengadaan.MODE_SEMUA, bg="white").grid(row=0, column=0, padx=5)
+    tk.Radiobutton(mode_frame, text="Hanya kecocokan pertama", variable=mode_var,
+                   value=fungsi_hapuspengadaan.MODE_PERTAMA, bg="white").grid(row=0, column=1, padx=5)
+    index_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(mode_frame, text="Gunakan indeks lokal", variable=index_var,
+                   bg="white").grid(row=1, column=0, columnspan=2)
+
+    global run_button, stop_button, resume_button
+    button_frame = tk.Frame(window, bg="white")
+    button_frame.pack(pady=10)
+    run_button = tk.Button(button_frame, text="🔍 Pilih File & Hapus", bg="#B22222", fg="white", font=("Helvetica", 12), command=run_hapus_pengadaan)
+    run_button.grid(row=0, column=0, padx=5)
+    # Lanjutkan run yang terputus: hanya batch yang belum ter-commit
+    resume_button = tk.Button(button_frame, text="↩ Lanjutkan run terakhir", bg="#4682B4", fg="white", font=("Helvetica", 12),
+                              command=lambda: run_hapus_pengadaan(resume=True))
+    resume_button.grid(row=0, column=1, padx=5)
+    stop_button = tk.Button(button_frame, text="⛔ STOP", bg="#555555", fg="white", font=("Helvetica", 12), command=stop_process)
+    stop_button.grid(row=0, column=2, padx=5)
+    stop_button.config(state="disabled")
 
     text_log = scrolledtext.ScrolledText(window, wrap=tk.WORD, height=15)
     text_log.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
     text_log.configure(state="disabled")
+    # Log dari thread pekerja lewat antrean; widget hanya menyimpan baris terakhir
+    log_pump = fungsi_logpump.LogPump(text_log, "hapus")
+
+    # Ringkasan per langkah dari trace run terakhir
+    summary_label = tk.Label(window, text="Ringkasan per langkah", font=("Helvetica", 10, "bold"), bg="white")
+    summary_label.pack(anchor="w", padx=10)
+    summary_columns = ("Langkah", "Durasi", "API", "Waktu API", "Retry", "Tunggu kuota", "KB")
+    summary_tree = ttk.Treeview(window, columns=summary_columns, show="headings", height=6)
+    for column in summary_columns:
+        summary_tree.heading(column, text=column)
+        summary_tree.column(column, width=140 if column == "Langkah" else 80, anchor="w" if column == "Langkah" else "e")
+    summary_tree.pack(fill=tk.X, padx=10, pady=(0, 10))
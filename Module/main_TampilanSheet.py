@@ -4,6 +4,8 @@ import threading
 
 from globals import get_stop_requested, set_stop_requested
 from Module import fungsi_tampilansheet  # pastikan path-nya sesuai
+from Module import fungsi_trace
+from Module import fungsi_logpump
 
 def center_window(root, width=600, height=400):
     screen_width = root.winfo_screenwidth()
@@ -14,39 +16,50 @@ def center_window(root, width=600, height=400):
 
 # Fungsi pemanggil utama
 def show_window(root):
-    def run_main_function():
+    def run_main_function(resume=False):
         center_window(root)
         set_stop_requested(False)
-        log_text.configure(state="normal")
-        log_text.delete(1.0, tk.END)
-        log_text.configure(state="disabled")
-
-        def logger(msg):
-            log_text.configure(state="normal")
-            log_text.insert(tk.END, msg + "\n")
-            log_text.see(tk.END)
-            log_text.configure(state="disabled")
+        log_pump.start_run()
+        options = {"full": full_var.get(), "diff": diff_var.get(), "dry_run": dry_run_var.get(), "resume": resume}
 
         def target():
             try:
-                fungsi_tampilansheet.main_tampilan_sheet(logger=logger)
+                fungsi_tampilansheet.main_tampilan_sheet(logger=log_pump, **options)
             finally:
-                run_button.config(state="normal")
-                stop_button.config(state="disabled")
+                log_pump.call(finish_run)
+                log_pump.finish_run()
 
         thread = threading.Thread(target=target)
         thread.start()
 
         run_button.config(state="disabled")
+        resume_button.config(state="disabled")
         stop_button.config(state="normal")
 
+    def finish_run():
+        run_button.config(state="normal")
+        resume_button.config(state="normal")
+        stop_button.config(state="disabled")
+        fill_summary()
+
+    def fill_summary():
+        summary_tree.delete(*summary_tree.get_children())
+        trace = fungsi_trace.last_run()
+        if trace is None:
+            return
+        for r in trace.step_summary():
+            summary_tree.insert("", tk.END, values=(
+                r["step"], f"{r['duration']:.1f} dtk", r["calls"], f"{r['api_time']:.1f} dtk",
+                r["retries"], f"{r['quota_wait']:.1f} dtk", f"{(r['bytes_sent'] + r['bytes_received']) / 1024:.1f}",
+            ))
+
     def stop_process():
         set_stop_requested(True)
         stop_button.config(state="disabled")
 
     window = tk.Toplevel()
     window.title("🧾 Tampilan Sheet")
-    window.geometry("700x500")
+    window.geometry("700x660")
     window.configure(bg="white")
     # Sembunyikan root utama
     root.withdraw()
@@ -63,7 +76,7 @@ def show_window(root):
     button_frame = tk.Frame(window, bg="white")
     button_frame.pack(pady=5)
 
-    global run_button, stop_button
+    global run_button, stop_button, resume_button
     run_button = tk.Button(button_frame, text="▶ Jalankan", width=20, bg="#2E8B57", fg="white", command=run_main_function)
     run_button.grid(row=0, column=0, padx=5)
 
@@ -71,6 +84,36 @@ def show_window(root):
     stop_button.grid(row=0, column=1, padx=5)
     stop_button.config(state="disabled")
 
+    # Lanjutkan run yang terputus: sheet yang sudah selesai dilewati
+    resume_button = tk.Button(button_frame, text="↩ Lanjutkan run terakhir", width=20, bg="#4682B4", fg="white",
+                              command=lambda: run_main_function(resume=True))
+    resume_button.grid(row=0, column=2, padx=5)
+
+    # Default incremental: hanya sheet yang berubah sejak run terakhir
+    full_var = tk.BooleanVar(value=False)
+    diff_var = tk.BooleanVar(value=False)
+    dry_run_var = tk.BooleanVar(value=False)
+    option_frame = tk.Frame(window, bg="white")
+    option_frame.pack()
+    tk.Checkbutton(option_frame, text="Proses penuh (semua sheet, abaikan state)", variable=full_var,
+                   bg="white").grid(row=0, column=0, padx=5)
+    tk.Checkbutton(option_frame, text="Mode diff (tulis sel yang berubah saja)", variable=diff_var,
+                   bg="white").grid(row=0, column=1, padx=5)
+    tk.Checkbutton(option_frame, text="Dry run", variable=dry_run_var,
+                   bg="white").grid(row=0, column=2, padx=5)
+
     log_text = scrolledtext.ScrolledText(window, wrap=tk.WORD, height=20)
     log_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
     log_text.configure(state="disabled")
+    # Log dari thread pekerja lewat antrean; widget hanya menyimpan baris terakhir
+    log_pump = fungsi_logpump.LogPump(log_text, "tampilan")
+
+    # Ringkasan per langkah dari trace run terakhir
+    summary_label = tk.Label(window, text="Ringkasan per langkah", font=("Helvetica", 10, "bold"), bg="white")
+    summary_label.pack(anchor="w", padx=10)
+    summary_columns = ("Langkah", "Durasi", "API", "Waktu API", "Retry", "Tunggu kuota", "KB")
+    summary_tree = ttk.Treeview(window, columns=summary_columns, show="headings", height=6)
+    for column in summary_columns:
+        summary_tree.heading(column, text=column)
+        summary_tree.column(column, width=140 if column == "Langkah" else 80, anchor="w" if column == "Langkah" else "e")
+    summary_tree.pack(fill=tk.X, padx=10, pady=(0, 10))
@@ -0,0 +1,234 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+# Benchmark end-to-end Tampilan Sheet dan Hapus Pengadaan terhadap server tiruan lokal.
+# Jalankan dari root repo: python benchmark/bench_e2e.py --sheets 20 --rows 2000
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_sheets_server import FakeSheetsServer, FakeSpreadsheet
+
+SPREADSHEET_ID = "bench-spreadsheet"
+# Skenario banyak-sheet: katalog terpisah dengan banyak sheet kecil. Range batchGet-nya membuat URI
+# lebih dari 2048 karakter, sehingga googleapiclient mengirimnya sebagai POST + X-HTTP-Method-Override
+MANY_SHEETS_SPREADSHEET_ID = "bench-banyak-sheet"
+MANY_SHEETS_COUNT = 120
+MANY_SHEETS_ROWS = 20
+MANY_SHEETS_DELETE = 60
+# Skenario tampilan-server-fill: katalog kembar, satu diisi di klien (TAMPILAN_FILL=list) dan satu
+# lewat autoFill server (TAMPILAN_FILL=server); kolom hasil isian keduanya harus sama persis
+SERVER_FILL_SPREADSHEET_IDS = {"list": "bench-fill-list", "server": "bench-fill-server"}
+SERVER_FILL_SHEETS = 3
+SERVER_FILL_ROWS = 200
+SERVER_FILL_COLUMNS = {"A": 0, "B": 1, "AA": 26, "AB": 27}
+# Layout katalog: ringkasan di baris 1-8, header di baris 9, data mulai baris 10
+HEADER = [
+    "No", "Link", "Judul", "Penulis", "ISBN Cetak", "ISBN Elektronik*", "Penerbit", "Tahun",
+    "Edisi", "Kategori", "Bahasa", "Halaman", "Format", "Ukuran", "DDC", "Subjek",
+    "Sinopsis", "Kota", "Seri", "Jilid", "Cetakan", "Status", "Distributor", "Catatan",
+    "Harga", "Jumlah", "Total", "UUID",
+]
+NON_CATALOG_SHEETS = ("Dashboard", "Rekap", "Petunjuk")
+SCENARIOS = [
+    "tampilan", "tampilan-incremental", "hapus-scan", "hapus-index", "hapus-index-warm", "banyak-sheet",
+    "tampilan-server-fill",
+]
+
+def sheet_name(n):
+    """Nama sheet hanya huruf supaya nama named range tidak bentrok: A, B, ..., AA, AB"""
+    name = ""
+    n += 1
+    while n:
+        n, rem = divmod(n - 1, 26)
+        name = chr(65 + rem) + name
+    return f"Penerbit {name}"
+
+def catalog_rows(sheet_index, rows, rng):
+    grid = [[""] * 28 for _ in range(8)]
+    grid[0][6], grid[0][9] = "Ringkasan", "Total"
+    grid.append(list(HEADER))
+    for r in range(rows):
+        uuid = f"{sheet_index:04d}-{r:06d}-{rng.randrange(16 ** 8):08x}"
+        grid.append([
+            "", "", f"Judul {sheet_index}-{r}", f"Penulis {r % 97}",
+            f"978{sheet_index:04d}{r:06d}", f"E978{sheet_index:04d}{r:06d}", "Penerbit", 2000 + r % 25,
+            "1", f"Kategori {r % 12}", "Indonesia", 100 + r % 400, "PDF", "A5", "", "",
+            "", "Jakarta", "", "", "1", "Aktif", "", "",
+            rng.randrange(20, 200) * 1000, rng.randrange(1, 5), "", uuid,
+        ])
+    return grid
+
+def make_catalog(n_sheets, n_rows, extra_rows=50, seed=1, spreadsheet_id=SPREADSHEET_ID):
+    """Spreadsheet sintetis: 3 sheet non-katalog lalu n_sheets sheet katalog × n_rows baris"""
+    rng = random.Random(seed)
+    sheets = [(title, [[""] * 28], 100) for title in NON_CATALOG_SHEETS]
+    for i in range(n_sheets):
+        rows = catalog_rows(i, n_rows, rng)
+        sheets.append((sheet_name(i), rows, len(rows) + extra_rows))
+    return FakeSpreadsheet(spreadsheet_id, "Katalog Benchmark", sheets)
+
+def write_deletion_file(spreadsheet, count, path, seed=2):
+    """CSV kunci penghapusan (campuran UUID dan ISBN) yang diambil acak dari katalog"""
+    rng = random.Random(seed)
+    catalog_rows = [
+        row for sheet in spreadsheet.sheets[len(NON_CATALOG_SHEETS):]
+        for row in sheet["rows"][9:] if len(row) == 28 and row[27]
+    ]
+    lines = ["UUID,ISBN Cetak,ISBN Elektronik*"]
+    for _ in range(min(count, len(catalog_rows))):
+        row = rng.choice(catalog_rows)
+        choice = rng.randrange(3)
+        lines.append(",".join([
+            row[27] if choice == 0 else "", row[4] if choice == 1 else "", row[5] if choice == 2 else ""
+        ]))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+def remaining_deletion_keys(spreadsheet, path):
+    """Kunci di file penghapusan yang masih ada di katalog"""
+    with open(path, encoding="utf-8") as f:
+        wanted = {value for line in f.read().splitlines()[1:] for value in line.split(",") if value}
+    present = {
+        value for sheet in spreadsheet.sheets[len(NON_CATALOG_SHEETS):]
+        for row in sheet["rows"][9:] if len(row) == 28 for value in (row[4], row[5], row[27])
+    }
+    return wanted & present
+
+def fill_mismatches(expected, actual):
+    """Beda sheet (judul, jumlah baris, kolom A/B/AA/AB) antara hasil isian klien dan server"""
+    mismatches = []
+    for want, got in zip(expected.sheets, actual.sheets):
+        title = want["properties"]["title"]
+        row_count = want["properties"]["gridProperties"]["rowCount"]
+        if got["properties"]["title"] != title or got["properties"]["gridProperties"]["rowCount"] != row_count:
+            mismatches.append(f"{title}: judul/jumlah baris berbeda")
+            continue
+        for row in range(9, row_count):
+            for letter, col in SERVER_FILL_COLUMNS.items():
+                cells = [
+                    sheet["rows"][row][col] if row < len(sheet["rows"]) and col < len(sheet["rows"][row]) else ""
+                    for sheet in (want, got)
+                ]
+                if cells[0] != cells[1]:
+                    mismatches.append(f"{title}!{letter}{row + 1}: klien {cells[0]!r}, server {cells[1]!r}")
+    return mismatches
+
+def configure_environment(server, workdir):
+    """Arahkan semua modul ke server tiruan. Harus dipanggil sebelum modul di-import"""
+    os.environ.update({
+        "SHEETS_API_ENDPOINT": server.endpoint,
+        "SPREADSHEET_ID": SPREADSHEET_ID,
+        "SHEET_MULAI": "1",
+        "EXCLUDED_SHEETS": ",".join(NON_CATALOG_SHEETS),
+        "QUOTA_READ_PER_MINUTE": "1000000",
+        "QUOTA_WRITE_PER_MINUTE": "1000000",
+        "API_BACKOFF_BASE": "0.05",
+        "API_BACKOFF_MAX": "0.5",
+        "TAMPILAN_STATE_PATH": os.path.join(workdir, "tampilan_state.json"),
+        "HAPUS_INDEX_PATH": os.path.join(workdir, "katalog_index.sqlite"),
+        "TRACE_DIR": os.path.join(workdir, "trace"),
+        "RUN_JOURNAL_PATH": os.path.join(workdir, "run_journal.json"),
+    })
+
+def run_scenario(name, server, workdir, deletion_path, verbose=False):
+    from Module import fungsi_tampilansheet, fungsi_hapuspengadaan
+    from google.auth.credentials import AnonymousCredentials
+    from Module import fungsi_sheetsclient
+
+    fungsi_sheetsclient.use_credentials(AnonymousCredentials())
+    lines = []
+    logger = print if verbose else lines.append
+
+    server.reset_stats()
+    started = time.perf_counter()
+    if name == "tampilan":
+        fungsi_tampilansheet.main_tampilan_sheet(logger=logger, full=True)
+    elif name == "tampilan-incremental":
+        fungsi_tampilansheet.main_tampilan_sheet(logger=logger)
+    elif name == "banyak-sheet":
+        spreadsheet = make_catalog(MANY_SHEETS_COUNT, MANY_SHEETS_ROWS, spreadsheet_id=MANY_SHEETS_SPREADSHEET_ID)
+        server.add_spreadsheet(spreadsheet)
+        many_path = os.path.join(workdir, "hapus-banyak-sheet.csv")
+        write_deletion_file(spreadsheet, MANY_SHEETS_DELETE, many_path)
+        os.environ["SPREADSHEET_ID"] = MANY_SHEETS_SPREADSHEET_ID
+        try:
+            fungsi_tampilansheet.main_tampilan_sheet(logger=logger, full=True)
+            fungsi_hapuspengadaan.main_hapus_pengadaan(logger=logger, use_index=False, file_path=many_path)
+        finally:
+            os.environ["SPREADSHEET_ID"] = SPREADSHEET_ID
+        remaining = remaining_deletion_keys(spreadsheet, many_path)
+        if remaining:
+            lines.append(f"❌ {len(remaining)} kunci hapus masih ada di katalog banyak-sheet")
+    elif name == "tampilan-server-fill":
+        catalogs = {}
+        try:
+            for strategy, spreadsheet_id in SERVER_FILL_SPREADSHEET_IDS.items():
+                catalogs[strategy] = make_catalog(SERVER_FILL_SHEETS, SERVER_FILL_ROWS, spreadsheet_id=spreadsheet_id)
+                server.add_spreadsheet(catalogs[strategy])
+                os.environ["SPREADSHEET_ID"] = spreadsheet_id
+                os.environ["TAMPILAN_FILL"] = strategy
+                fungsi_tampilansheet.main_tampilan_sheet(logger=logger, full=True)
+        finally:
+            os.environ["SPREADSHEET_ID"] = SPREADSHEET_ID
+            os.environ.pop("TAMPILAN_FILL", None)
+        mismatches = fill_mismatches(catalogs["list"], catalogs["server"])
+        if mismatches:
+            lines.append(f"❌ {len(mismatches)} sel isian server berbeda dari isian klien, mis. {mismatches[0]}")
+    else:
+        fungsi_hapuspengadaan.main_hapus_pengadaan(
+            logger=logger, use_index=name != "hapus-scan", file_path=deletion_path
+        )
+    elapsed = time.perf_counter() - started
+
+    errors = [line for line in lines if line.startswith(("❌", "⚠️ Gagal"))]
+    return elapsed, server.stats(), errors
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end dengan server Sheets API tiruan")
+    parser.add_argument("--sheets", type=int, default=10, help="jumlah sheet katalog")
+    parser.add_argument("--rows", type=int, default=1000, help="baris data per sheet")
+    parser.add_argument("--delete", type=int, default=200, help="jumlah kunci penghapusan")
+    parser.add_argument("--latency-ms", type=float, default=0, help="latensi buatan per request")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="peluang balasan 429 per request")
+    parser.add_argument("--retry-after", type=float, default=None, help="nilai header Retry-After pada 429")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS,
+                        help="skenario yang dijalankan (default: semua, berurutan)")
+    parser.add_argument("--verbose", action="store_true", help="tampilkan log modul")
+    args = parser.parse_args()
+
+    server = FakeSheetsServer(args.latency_ms, args.rate_limit, args.retry_after).start()
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    configure_environment(server, workdir)
+
+    spreadsheet = make_catalog(args.sheets, args.rows)
+    server.add_spreadsheet(spreadsheet)
+    deletion_path = os.path.join(workdir, "hapus.csv")
+
+    print(f"📦 {args.sheets} sheet × {args.rows} baris, {args.delete} kunci hapus, "
+          f"latensi {args.latency_ms:g} ms, 429 {args.rate_limit:.0%}")
+    print(f"{'skenario':>22} | {'waktu (dtk)':>11} | {'panggilan':>9} | {'429':>4} | "
+          f"{'terkirim (KB)':>13} | {'diterima (KB)':>13}")
+    print("-" * 88)
+    details = []
+    for n, name in enumerate(args.scenario or SCENARIOS):
+        # Kunci hapus diambil ulang dari isi katalog saat ini (run sebelumnya sudah menghapus baris)
+        write_deletion_file(spreadsheet, args.delete, deletion_path, seed=n)
+        elapsed, stats, errors = run_scenario(name, server, workdir, deletion_path, args.verbose)
+        print(f"{name:>22} | {elapsed:>11.2f} | {stats['total_calls']:>9} | {stats['rate_limited']:>4} | "
+              f"{stats['bytes_in'] / 1024:>13.1f} | {stats['bytes_out'] / 1024:>13.1f}")
+        details.append((name, stats["calls"], errors))
+
+    print()
+    for name, calls, errors in details:
+        breakdown = ", ".join(f"{endpoint}={count}" for endpoint, count in sorted(calls.items()))
+        print(f"{name}: {breakdown}")
+        for error in errors:
+            print(f"    {error}")
+    server.stop()
+
+if __name__ == "__main__":
+    main()
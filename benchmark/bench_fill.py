@@ -0,0 +1,40 @@
+import os
+import sys
+import json
+import time
+
+# Jalankan dari root repo: python benchmark/bench_fill.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Module import fungsi_tampilansheet as tampilan
+
+ROW_COUNTS = [100, 1000, 9000, 50000]
+START_ROW = 10
+
+def build_requests(strategy, last_row):
+    requests = []
+    for col_letter, value_or_formula, mode in tampilan.FILL_COLUMNS:
+        if strategy == tampilan.FILL_SERVER:
+            requests += tampilan.build_server_fill_requests(
+                0, col_letter, START_ROW, last_row, value_or_formula, mode
+            )
+        else:
+            requests += tampilan.build_column_fill_requests(
+                0, col_letter, START_ROW, last_row, value_or_formula, mode
+            )
+    return requests
+
+def main():
+    print(f"{'baris':>8} | {'strategi':>8} | {'request':>7} | {'payload (byte)':>14} | {'waktu susun (ms)':>16}")
+    print("-" * 68)
+    for rows in ROW_COUNTS:
+        last_row = START_ROW + rows - 1
+        for strategy in (tampilan.FILL_LIST, tampilan.FILL_SERVER):
+            started = time.perf_counter()
+            requests = build_requests(strategy, last_row)
+            payload = json.dumps({"requests": requests})
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"{rows:>8} | {strategy:>8} | {len(requests):>7} | {len(payload):>14} | {elapsed:>16.1f}")
+
+if __name__ == "__main__":
+    main()
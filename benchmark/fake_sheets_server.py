@@ -0,0 +1,424 @@
+import re
+import json
+import time
+import random
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+
+# Server tiruan Google Sheets API v4 untuk benchmark (bukan untuk produksi).
+# Mendukung endpoint yang dipakai modul: spreadsheets.get, values get/batchGet/update,
+# values:batchGetByDataFilter dan spreadsheets:batchUpdate, dengan latensi dan error 429 buatan.
+# Formula disimpan apa adanya (tidak dihitung); request format hanya divalidasi lalu diabaikan.
+# autoFill disalin ke bawah: referensi baris relatif di formula digeser, deret angka dilanjutkan.
+
+A1_PATTERN = re.compile(r"^([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?$")
+# Request batchUpdate yang hanya mengubah format/filter: diterima tanpa mengubah nilai sel
+FORMAT_ONLY_REQUESTS = {"repeatCell", "updateBorders", "setBasicFilter", "copyPaste"}
+# Bagian formula untuk autoFill: string (tidak disentuh) atau referensi sel A1 dengan baris
+FORMULA_PART = re.compile(r'("(?:[^"]|"")*")|(?<![A-Za-z0-9_.$])(\$?[A-Z]{1,3})(\$?)(\d+)(?![A-Za-z0-9_(])')
+
+class FakeApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def column_index(letters):
+    """'A' -> 0, 'AB' -> 27"""
+    n = 0
+    for c in letters:
+        n = n * 26 + ord(c) - 64
+    return n - 1
+
+def split_sheet_range(range_a1):
+    """"'Judul'!A1:B2" -> ("Judul", "A1:B2"); tanpa nama sheet -> (None, range)"""
+    if "!" not in range_a1:
+        return None, range_a1
+    title, cells = range_a1.rsplit("!", 1)
+    if title.startswith("'") and title.endswith("'"):
+        title = title[1:-1].replace("''", "'")
+    return title, cells
+
+def parse_cells(cells):
+    """Bagian sel A1 -> (baris_awal, baris_akhir, kolom_awal, kolom_akhir), 0-based, akhir eksklusif.
+    None berarti terbuka (sampai ujung sheet)"""
+    m = A1_PATTERN.match(cells)
+    if not m:
+        raise FakeApiError(400, f"Unable to parse range: {cells}")
+    c0, r0, c1, r1 = m.groups()
+    if m.group(3) is None and m.group(4) is None:
+        c1, r1 = c0, r0
+    return (
+        int(r0) - 1 if r0 else 0,
+        int(r1) if r1 else None,
+        column_index(c0) if c0 else 0,
+        column_index(c1) + 1 if c1 else None,
+    )
+
+def shift_formula_rows(formula, offset):
+    """Geser referensi baris relatif di formula sejauh `offset` (baris absolut $ tetap)"""
+    def shift(m):
+        if m.group(1) or m.group(3):
+            return m.group(0)
+        return f"{m.group(2)}{int(m.group(4)) + offset}"
+    return FORMULA_PART.sub(shift, formula)
+
+def fill_value(seed, i):
+    """Nilai baris ke-i (0-based, setelah sumber) hasil autoFill dari nilai sumber `seed`"""
+    n = len(seed)
+    numbers = all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in seed)
+    if numbers and n >= 2:
+        # Deret linier seperti autofill Sheets: lanjutkan selisih tetap dari sumber
+        step = (seed[-1] - seed[0]) / (n - 1)
+        value = seed[-1] + step * (i + 1)
+        return int(value) if float(value).is_integer() else value
+    value = seed[i % n]
+    if isinstance(value, str) and value.startswith("="):
+        return shift_formula_rows(value, (i // n + 1) * n)
+    return value
+
+def plain_value(cell):
+    """Nilai userEnteredValue (CellData) -> nilai sel tersimpan"""
+    entered = cell.get("userEnteredValue")
+    if not entered:
+        return ""
+    for key in ("formulaValue", "stringValue", "numberValue", "boolValue"):
+        if key in entered:
+            return entered[key]
+    return ""
+
+class FakeSpreadsheet:
+    """Satu spreadsheet: properti sheet, isi sel per sheet dan named range"""
+
+    def __init__(self, spreadsheet_id, title, sheets):
+        self.spreadsheet_id = spreadsheet_id
+        self.title = title
+        # sheets: list (judul, baris [list nilai], rowCount)
+        self.sheets = []
+        for index, (sheet_title, rows, row_count) in enumerate(sheets):
+            self.sheets.append({
+                "properties": {
+                    "sheetId": index * 1000 + 7,
+                    "title": sheet_title,
+                    "index": index,
+                    "sheetType": "GRID",
+                    "gridProperties": {"rowCount": max(row_count, len(rows)), "columnCount": 28},
+                },
+                "rows": [list(row) for row in rows],
+            })
+        self.named_ranges = []
+        self.next_named_range = 1
+
+    def sheet(self, title=None, sheet_id=None):
+        for sheet in self.sheets:
+            props = sheet["properties"]
+            if (title is None and sheet_id is None) or props["title"] == title or props["sheetId"] == sheet_id:
+                return sheet
+        raise FakeApiError(400, f"Unable to parse range / unknown sheet: {title or sheet_id}")
+
+    def metadata(self):
+        return {
+            "spreadsheetId": self.spreadsheet_id,
+            "properties": {"title": self.title},
+            "sheets": [{"properties": json.loads(json.dumps(s["properties"]))} for s in self.sheets],
+            "namedRanges": json.loads(json.dumps(self.named_ranges)),
+        }
+
+    # ---------------------------- values ----------------------------
+
+    def read(self, range_a1, major_dimension="ROWS"):
+        title, cells = split_sheet_range(range_a1)
+        sheet = self.sheet(title)
+        r0, r1, c0, c1 = parse_cells(cells)
+        row_count = sheet["properties"]["gridProperties"]["rowCount"]
+        r1 = min(row_count if r1 is None else r1, row_count)
+        rows = []
+        for row in sheet["rows"][r0:r1]:
+            rows.append(list(row[c0:c1] if c1 is not None else row[c0:]))
+        # Seperti API asli: sel kosong di ujung baris dan baris kosong di ujung tidak dikirim
+        for row in rows:
+            while row and row[-1] == "":
+                row.pop()
+        while rows and not rows[-1]:
+            rows.pop()
+        if major_dimension == "COLUMNS":
+            width = max((len(row) for row in rows), default=0)
+            columns = [[row[i] if i < len(row) else "" for row in rows] for i in range(width)]
+            for column in columns:
+                while column and column[-1] == "":
+                    column.pop()
+            rows = columns
+        result = {"range": range_a1, "majorDimension": major_dimension}
+        if rows:
+            result["values"] = rows
+        return result
+
+    def write_cell(self, sheet, row, col, value):
+        rows = sheet["rows"]
+        while len(rows) <= row:
+            rows.append([])
+        line = rows[row]
+        while len(line) <= col:
+            line.append("")
+        line[col] = value
+
+    def update(self, range_a1, values):
+        title, cells = split_sheet_range(range_a1)
+        sheet = self.sheet(title)
+        r0, _, c0, _ = parse_cells(cells)
+        for i, row in enumerate(values):
+            for j, value in enumerate(row):
+                self.write_cell(sheet, r0 + i, c0 + j, value)
+        return {
+            "spreadsheetId": self.spreadsheet_id,
+            "updatedRange": range_a1,
+            "updatedRows": len(values),
+            "updatedCells": sum(len(row) for row in values),
+        }
+
+    # --------------------------- batchUpdate ---------------------------
+
+    def batch_update(self, requests):
+        # Validasi dulu pada salinan supaya request gagal tidak mengubah apa pun (atomik seperti API asli)
+        snapshot = json.dumps([self.sheets, self.named_ranges, self.next_named_range])
+        replies = []
+        try:
+            for request in requests:
+                (kind, body), = request.items()
+                handler = getattr(self, f"_apply_{kind}", None)
+                if handler is not None:
+                    replies.append(handler(body))
+                elif kind in FORMAT_ONLY_REQUESTS:
+                    replies.append({})
+                else:
+                    raise FakeApiError(400, f"Unsupported request: {kind}")
+        except FakeApiError:
+            self.sheets, self.named_ranges, self.next_named_range = json.loads(snapshot)
+            raise
+        return {"spreadsheetId": self.spreadsheet_id, "replies": replies}
+
+    def _apply_updateSheetProperties(self, body):
+        props = body["properties"]
+        sheet = self.sheet(sheet_id=props.get("sheetId", 0))
+        fields = body.get("fields", "")
+        if "title" in fields.split(","):
+            if any(s["properties"]["title"] == props["title"] and s is not sheet for s in self.sheets):
+                raise FakeApiError(
+                    400, f"Invalid requests: A sheet with the name \"{props['title']}\" already exists."
+                )
+            sheet["properties"]["title"] = props["title"]
+        if "gridProperties" in fields:
+            sheet["properties"]["gridProperties"].update(props.get("gridProperties", {}))
+        return {}
+
+    def _apply_deleteDimension(self, body):
+        rng = body["range"]
+        sheet = self.sheet(sheet_id=rng.get("sheetId", 0))
+        if rng["dimension"] != "ROWS":
+            return {}
+        grid = sheet["properties"]["gridProperties"]
+        start, end = rng.get("startIndex", 0), rng["endIndex"]
+        if end > grid["rowCount"] or start >= end:
+            raise FakeApiError(400, f"Invalid requests: deleteDimension range {start}:{end}")
+        if start == 0 and end >= grid["rowCount"]:
+            raise FakeApiError(400, "Invalid requests: You can't delete all the rows on the sheet.")
+        del sheet["rows"][start:end]
+        grid["rowCount"] -= end - start
+        return {}
+
+    def _apply_updateCells(self, body):
+        start = body["start"]
+        sheet = self.sheet(sheet_id=start.get("sheetId", 0))
+        if "userEnteredValue" in body.get("fields", ""):
+            for i, row in enumerate(body.get("rows", [])):
+                for j, cell in enumerate(row.get("values", [])):
+                    self.write_cell(
+                        sheet, start.get("rowIndex", 0) + i, start.get("columnIndex", 0) + j, plain_value(cell)
+                    )
+        return {}
+
+    def _apply_autoFill(self, body):
+        if "sourceAndDestination" not in body:
+            raise FakeApiError(400, "Unsupported autoFill: only sourceAndDestination")
+        spec = body["sourceAndDestination"]
+        if spec.get("dimension") != "ROWS":
+            raise FakeApiError(400, "Unsupported autoFill dimension")
+        source = spec["source"]
+        sheet = self.sheet(sheet_id=source.get("sheetId", 0))
+        r0, r1 = source.get("startRowIndex", 0), source["endRowIndex"]
+        fill_length = spec.get("fillLength", 0)
+        if r1 <= r0 or fill_length <= 0:
+            raise FakeApiError(400, "Invalid autoFill source/fillLength")
+        if r1 + fill_length > sheet["properties"]["gridProperties"]["rowCount"]:
+            raise FakeApiError(400, "autoFill destination exceeds grid limits")
+        for col in range(source.get("startColumnIndex", 0), source["endColumnIndex"]):
+            seed = [
+                sheet["rows"][row][col] if row < len(sheet["rows"]) and col < len(sheet["rows"][row]) else ""
+                for row in range(r0, r1)
+            ]
+            for i in range(fill_length):
+                self.write_cell(sheet, r1 + i, col, fill_value(seed, i))
+        return {}
+
+    def _apply_addNamedRange(self, body):
+        named_range = dict(body["namedRange"])
+        if any(r["name"] == named_range["name"] for r in self.named_ranges):
+            raise FakeApiError(400, f"Invalid requests: Named range '{named_range['name']}' already exists.")
+        named_range["namedRangeId"] = f"nr{self.next_named_range}"
+        self.next_named_range += 1
+        self.named_ranges.append(named_range)
+        return {"addNamedRange": {"namedRange": named_range}}
+
+    def _apply_updateNamedRange(self, body):
+        named_range = body["namedRange"]
+        for current in self.named_ranges:
+            if current["namedRangeId"] == named_range["namedRangeId"]:
+                current["range"] = named_range["range"]
+                return {}
+        raise FakeApiError(400, f"Invalid requests: No named range with id {named_range['namedRangeId']}")
+
+    def _apply_deleteNamedRange(self, body):
+        before = len(self.named_ranges)
+        self.named_ranges = [r for r in self.named_ranges if r["namedRangeId"] != body["namedRangeId"]]
+        if len(self.named_ranges) == before:
+            raise FakeApiError(400, f"Invalid requests: No named range with id {body['namedRangeId']}")
+        return {}
+
+class FakeSheetsServer:
+    """Server HTTP lokal. Jalankan dengan start(), alamatnya di .endpoint"""
+
+    def __init__(self, latency_ms=0, rate_limit=0.0, retry_after=None, seed=0):
+        self.spreadsheets = {}
+        self.latency = latency_ms / 1000.0
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset_stats()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self.endpoint = f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+        self.thread = None
+
+    def add_spreadsheet(self, spreadsheet):
+        self.spreadsheets[spreadsheet.spreadsheet_id] = spreadsheet
+
+    def reset_stats(self):
+        with self.lock:
+            self.calls = Counter()
+            self.bytes_in = 0
+            self.bytes_out = 0
+            self.rate_limited = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "calls": dict(self.calls),
+                "total_calls": sum(self.calls.values()),
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "rate_limited": self.rate_limited,
+            }
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    # ------------------------------ routing ------------------------------
+
+    def route(self, method, path, query, body):
+        """-> (nama endpoint, fungsi yang menghasilkan respons JSON)"""
+        m = re.match(r"^/v4/spreadsheets/([^/:]+)(.*)$", path)
+        if not m:
+            raise FakeApiError(404, f"Not found: {path}")
+        spreadsheet = self.spreadsheets.get(m.group(1))
+        if spreadsheet is None:
+            raise FakeApiError(404, f"Requested entity was not found: {m.group(1)}")
+        rest = m.group(2)
+        major = query.get("majorDimension", ["ROWS"])[0]
+
+        if rest == "" and method == "GET":
+            return "spreadsheets.get", spreadsheet.metadata
+        if rest == ":batchUpdate" and method == "POST":
+            return "spreadsheets.batchUpdate", lambda: spreadsheet.batch_update(body.get("requests", []))
+        if rest == "/values:batchGet" and method == "GET":
+            return "values.batchGet", lambda: {
+                "spreadsheetId": spreadsheet.spreadsheet_id,
+                "valueRanges": [spreadsheet.read(r, major) for r in query.get("ranges", [])],
+            }
+        if rest == "/values:batchGetByDataFilter" and method == "POST":
+            major = body.get("majorDimension", "ROWS")
+            return "values.batchGetByDataFilter", lambda: {
+                "spreadsheetId": spreadsheet.spreadsheet_id,
+                "valueRanges": [
+                    {"valueRange": spreadsheet.read(f["a1Range"], major), "dataFilters": [f]}
+                    for f in body.get("dataFilters", [])
+                ],
+            }
+        if rest.startswith("/values/"):
+            range_a1 = unquote(rest[len("/values/"):])
+            if method == "GET":
+                return "values.get", lambda: spreadsheet.read(range_a1, major)
+            if method == "PUT":
+                return "values.update", lambda: spreadsheet.update(range_a1, body.get("values", []))
+        raise FakeApiError(404, f"Not found: {method} {path}")
+
+    def handle(self, method, raw_path, raw_body, headers=None):
+        time.sleep(self.latency)
+        headers = headers or {}
+        url = urlsplit(raw_path)
+        query = parse_qs(url.query)
+        # googleapiclient mengirim GET dengan URI > 2048 karakter sebagai POST +
+        # X-HTTP-Method-Override: GET, parameter query dipindah ke body form-encoded
+        method = headers.get("X-HTTP-Method-Override", method).upper()
+        if raw_body and headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+            for key, values in parse_qs(raw_body.decode("utf-8")).items():
+                query.setdefault(key, []).extend(values)
+            body = {}
+        else:
+            body = json.loads(raw_body) if raw_body else {}
+        with self.lock:
+            self.bytes_in += len(raw_path) + len(raw_body)
+            if self.rate_limit and self.random.random() < self.rate_limit:
+                self.rate_limited += 1
+                return 429, {"error": {"code": 429, "message": "Quota exceeded", "status": "RESOURCE_EXHAUSTED"}}
+        try:
+            name, respond = self.route(method, url.path, query, body)
+            with self.lock:
+                self.calls[name] += 1
+                return 200, respond()
+        except FakeApiError as e:
+            return e.status, {"error": {"code": e.status, "message": str(e), "status": "INVALID_ARGUMENT"}}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _serve(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw_body = self.rfile.read(length) if length else b""
+                status, payload = server.handle(self.command, self.path, raw_body, self.headers)
+                data = json.dumps(payload).encode("utf-8")
+                with server.lock:
+                    server.bytes_out += len(data)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=UTF-8")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429 and server.retry_after is not None:
+                    self.send_header("Retry-After", str(server.retry_after))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = _serve
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -1,4 +1,9 @@
 # globals.py
+import os
+
+# Folder repo: file data lokal (indeks, jurnal, state, trace) disimpan relatif ke sini, bukan ke CWD
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+
 _stop_requested = False
 
 def set_stop_requested(value: bool):
@@ -6,4 +11,8 @@ def set_stop_requested(value: bool):
     _stop_requested = value
 
 def get_stop_requested() -> bool:
-    return _stop_requested
\ No newline at end of file
+    return _stop_requested
+
+def repo_path(path: str) -> str:
+    """Path relatif dianggap relatif terhadap folder repo; path absolut dipakai apa adanya"""
+    return os.path.join(REPO_ROOT, os.path.expanduser(path))
@@ -1,31 +1,62 @@
+import time
+
+STARTED = time.perf_counter()
+
 import os
-import importlib.util
-import inspect
+import ast
+import importlib
+import threading
 import tkinter as tk
+from tkinter import messagebox
 
 MODULE_FOLDER = "Module"
+# Muat modul fungsi di background setelah launcher tampil (0 = hanya saat tombol diklik)
+PRELOAD_MODULES = os.getenv("LAUNCHER_PRELOAD", "1") == "1"
+
+def has_show_window(filepath):
+    """Cek show_window lewat parsing source, tanpa meng-import modul (pandas, gspread, dll.)"""
+    try:
+        with open(filepath, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=filepath)
+    except (OSError, SyntaxError, ValueError) as e:
+        print(f"❌ Gagal membaca modul {filepath}: {e}")
+        return False
+    return any(isinstance(node, ast.FunctionDef) and node.name == "show_window" for node in tree.body)
 
 def load_function_windows():
+    """Daftar (nama tampilan, nama modul) untuk modul yang punya show_window"""
     functions = []
-    for filename in os.listdir(MODULE_FOLDER):
+    for filename in sorted(os.listdir(MODULE_FOLDER)):
         if filename.endswith(".py") and not filename.startswith("_"):
-            filepath = os.path.join(MODULE_FOLDER, filename)
             module_name = filename[:-3]
-
-            spec = importlib.util.spec_from_file_location(module_name, filepath)
-            module = importlib.util.module_from_spec(spec)
-            try:
-                spec.loader.exec_module(module)
-            except Exception as e:
-                print(f"❌ Gagal load modul {module_name}: {e}")
-                continue
-
-            for name, func in inspect.getmembers(module, inspect.isfunction):
-                if name == "show_window":
-                    display_name = module_name.replace("main_", "").replace("_", " ").title()
-                    functions.append((display_name, func))
+            if has_show_window(os.path.join(MODULE_FOLDER, filename)):
+                display_name = module_name.replace("main_", "").replace("_", " ").title()
+                functions.append((display_name, module_name))
     return functions
 
+def load_window(module_name):
+    """Import modul saat dibutuhkan (sekali saja, import berikutnya dari cache)"""
+    return importlib.import_module(f"{MODULE_FOLDER}.{module_name}").show_window
+
+def open_window(root, module_name):
+    try:
+        show_window = load_window(module_name)
+    except Exception as e:
+        print(f"❌ Gagal load modul {module_name}: {e}")
+        messagebox.showerror("Gagal load modul", f"❌ Gagal load modul {module_name}: {e}")
+        return
+    show_window(root)
+
+def preload_windows(module_names):
+    """Import semua modul fungsi di background supaya klik pertama tidak menunggu"""
+    started = time.perf_counter()
+    for module_name in module_names:
+        try:
+            load_window(module_name)
+        except Exception as e:
+            print(f"❌ Gagal load modul {module_name}: {e}")
+    print(f"⏱️ Preload modul selesai dalam {time.perf_counter() - started:.2f} dtk")
+
 def center_window(root, width=600, height=400):
     screen_width = root.winfo_screenwidth()
     screen_height = root.winfo_screenheight()
@@ -52,14 +83,22 @@ def main():
     if not functions:
         tk.Label(root, text="❌ Tidak ada fungsi ditemukan.", fg="red", bg="white").pack(pady=10)
     else:
-        for label, func in functions:
-            # Gunakan lambda untuk kirim root ke fungsi show_window
+        for label, module_name in functions:
+            # Modul baru di-import saat tombol diklik
             btn = tk.Button(
                 btn_frame, text=label, width=30, font=("Helvetica", 12),
-                command=lambda f=func: f(root), bg="#2E8B57", fg="white"
+                command=lambda m=module_name: open_window(root, m), bg="#2E8B57", fg="white"
             )
             btn.pack(pady=6)
 
+    def on_ready():
+        print(f"⏱️ Launcher siap dalam {time.perf_counter() - STARTED:.2f} dtk")
+        if PRELOAD_MODULES and functions:
+            threading.Thread(
+                target=preload_windows, args=([m for _, m in functions],), daemon=True
+            ).start()
+
+    root.after_idle(on_ready)
     root.mainloop()
 
 if __name__ == "__main__":